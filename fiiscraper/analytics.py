@@ -0,0 +1,255 @@
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Creates a logger instance. The setup is done in main.py.
+log = logging.getLogger(__name__)
+
+# Window sizes, in trading days (rows per ticker)
+JANELA_52_SEMANAS = 252
+JANELA_VOLUME_CURTA = 20
+JANELA_VOLUME_LONGA = 60
+
+# Rows reduced at a time, bounds the (rows x window) matrix kept in memory
+TAMANHO_BLOCO = 10_000
+
+# Columns kept in the rolling state between runs
+COLUNAS_ESTADO = ['ticker', 'date', 'close', 'volume']
+
+# Where the rolling state is persisted between daily runs
+CHAVE_ESTADO_S3 = 'curated/_state/rolling_metrics/state_parquet'
+
+
+class RollingAnalytics:
+    """
+    Derives rolling per-ticker metrics for the curated layer.
+
+    Only the last rows of each ticker needed to complete the longest window
+    are kept as state, so a daily run processes just the new day's rows and
+    still produces exactly the same values as a full recompute over the
+    whole history.
+    """
+    def __init__(self, estado: pd.DataFrame = None):
+        # Longest window determines how many past rows must be remembered
+        self.tamanho_estado = max(JANELA_52_SEMANAS, JANELA_VOLUME_LONGA) - 1
+
+        if estado is None:
+            estado = pd.DataFrame(columns=COLUNAS_ESTADO)
+        self.estado = estado[COLUNAS_ESTADO].reset_index(drop=True)
+
+    # --- PUBLIC METHODS ---
+
+    def processar(self, novos_dados: pd.DataFrame) -> pd.DataFrame:
+        """
+        Computes the rolling metrics for the new rows and updates the state.
+
+        Rows whose date is not after the last date already in the state for
+        the same ticker are ignored, so re-running a day is harmless.
+
+        Args:
+            novos_dados (pd.DataFrame): Rows with 'ticker', 'date', 'close',
+                'volume', 'div_cota', 'p_vp' and 'segmento'.
+
+        Returns:
+            pd.DataFrame: One row per new (ticker, date) with the derived metrics.
+        """
+        novos = self._normalizar(novos_dados)
+        novos = self._descartar_ja_processados(novos)
+        if novos.empty:
+            log.info("  > No new rows to process for the rolling analytics.")
+            return pd.DataFrame(columns=self._colunas_saida())
+
+        # Past rows only feed the windows, they are not emitted again
+        partes = [novos.assign(_novo=True)]
+        if not self.estado.empty:
+            partes.insert(0, self.estado.assign(_novo=False))
+        combinado = pd.concat(partes, ignore_index=True)
+        combinado = combinado.sort_values(['ticker', 'date'], kind='mergesort').reset_index(drop=True)
+
+        close = combinado['close'].to_numpy(dtype=float)
+        volume = combinado['volume'].to_numpy(dtype=float)
+        inicio_grupos = self._inicio_grupos(combinado['ticker'].to_numpy())
+        # Windows are only reduced for the new rows
+        alvos = np.flatnonzero(combinado['_novo'].to_numpy(dtype=bool))
+
+        max_52 = _janela_por_grupo(close, inicio_grupos, alvos, JANELA_52_SEMANAS, np.nanmax, minimo=1)
+        vol_curto = _janela_por_grupo(volume, inicio_grupos, alvos, JANELA_VOLUME_CURTA, np.mean)
+        vol_longo = _janela_por_grupo(volume, inicio_grupos, alvos, JANELA_VOLUME_LONGA, np.mean)
+
+        resultado = combinado.iloc[alvos].copy()
+        resultado['max_52_semanas'] = max_52
+        resultado['drawdown_52_semanas'] = close[alvos] / max_52 - 1
+        resultado['volume_medio_20d'] = vol_curto
+        resultado['volume_medio_60d'] = vol_longo
+        resultado['tendencia_volume'] = vol_curto / vol_longo - 1
+        resultado['dy_12_meses'] = resultado['div_cota'] / resultado['close']
+        resultado['p_vp_zscore_segmento'] = self._zscore_segmento(resultado)
+
+        self._atualizar_estado(combinado)
+
+        resultado = resultado.sort_values(['date', 'ticker'], kind='mergesort')
+        log.info(f"  > Rolling analytics computed for {len(resultado)} new rows.")
+        return resultado[self._colunas_saida()].reset_index(drop=True)
+
+    def recalcular_completo(self, historico: pd.DataFrame) -> pd.DataFrame:
+        """
+        Recomputes the metrics over the full history, discarding the state.
+
+        Args:
+            historico (pd.DataFrame): The whole history, same columns as in `processar`.
+
+        Returns:
+            pd.DataFrame: The metrics for every row of the history.
+        """
+        self.estado = pd.DataFrame(columns=COLUNAS_ESTADO)
+        return self.processar(historico)
+
+    # --- PRIVATE METHODS ---
+
+    def _normalizar(self, dados: pd.DataFrame) -> pd.DataFrame:
+        """Coerces the input columns to the types used by the calculations."""
+        dados = dados.copy()
+        dados['date'] = pd.to_datetime(dados['date'])
+        # Raw partitions are stored as strings ('None', 'nan'), so coerce them
+        for coluna in ['close', 'volume', 'div_cota', 'p_vp']:
+            dados[coluna] = pd.to_numeric(dados[coluna], errors='coerce')
+        return dados.drop_duplicates(subset=['ticker', 'date'], keep='last')
+
+    def _descartar_ja_processados(self, novos: pd.DataFrame) -> pd.DataFrame:
+        """Drops rows that are not newer than the state for the same ticker."""
+        if self.estado.empty:
+            return novos
+        ultima_data = self.estado.groupby('ticker')['date'].max()
+        limite = novos['ticker'].map(ultima_data)
+        return novos[limite.isna() | (novos['date'] > limite)]
+
+    def _zscore_segmento(self, dados: pd.DataFrame) -> pd.Series:
+        """Cross-sectional P/VP z-score against the same segment on the same day."""
+        grupos = dados.groupby(['date', 'segmento'], dropna=False)['p_vp']
+        return (dados['p_vp'] - grupos.transform('mean')) / grupos.transform('std')
+
+    def _atualizar_estado(self, combinado: pd.DataFrame):
+        """Keeps only the trailing rows of each ticker needed by the next run."""
+        self.estado = (
+            combinado.groupby('ticker', sort=False)
+            .tail(self.tamanho_estado)[COLUNAS_ESTADO]
+            .reset_index(drop=True)
+        )
+
+    @staticmethod
+    def _inicio_grupos(tickers: np.ndarray) -> np.ndarray:
+        """Returns, for every row, the index of the first row of its ticker."""
+        mudou = np.r_[True, tickers[1:] != tickers[:-1]]
+        return np.maximum.accumulate(np.where(mudou, np.arange(len(tickers)), 0))
+
+    @staticmethod
+    def _colunas_saida() -> list[str]:
+        return [
+            'ticker', 'date', 'segmento', 'close', 'dy_12_meses', 'p_vp',
+            'p_vp_zscore_segmento', 'max_52_semanas', 'drawdown_52_semanas',
+            'volume_medio_20d', 'volume_medio_60d', 'tendencia_volume',
+        ]
+
+
+def preparar_entrada(df_indicadores: pd.DataFrame, df_precos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Joins a raw indicators partition with a raw price snapshot.
+
+    Every price row is kept, even without indicators (e.g., the indicators upload
+    failed or was blocked): the windows are counted in rows, so a missing day
+    would shift every later window. Only the indicator-based metrics of that
+    day come out null.
+
+    Args:
+        df_indicadores (pd.DataFrame): Raw daily indicators (one row per FII), may be empty.
+        df_precos (pd.DataFrame): Raw price snapshot with 'ticker', 'date', 'close' and 'volume'.
+
+    Returns:
+        pd.DataFrame: The input expected by `RollingAnalytics.processar`.
+    """
+    indicadores = df_indicadores.reindex(columns=['ticker', 'segmento', 'div_cota', 'p_vp'])
+    indicadores = indicadores.astype({'ticker': object})
+    precos = df_precos[['ticker', 'date', 'close', 'volume']]
+    return precos.merge(indicadores, on='ticker', how='left')
+
+
+def _janela_por_grupo(valores, inicio_grupos, alvos, janela, funcao, minimo=None):
+    """
+    Applies `funcao` over a trailing window that never crosses ticker boundaries,
+    only for the rows listed in `alvos`.
+
+    Every window is reduced independently (no running sums), so the result of
+    a row depends only on the rows inside its window and is bit-for-bit the
+    same whether the history is processed at once or day by day.
+    """
+    minimo = janela if minimo is None else minimo
+    resultado = np.empty(len(alvos), dtype=float)
+
+    # Pads the front so that every row has a full-size window
+    preenchido = np.concatenate([np.full(janela - 1, np.nan), valores])
+    deslocamentos = np.arange(janela)[None, :]
+
+    for inicio in range(0, len(alvos), TAMANHO_BLOCO):
+        bloco = alvos[inicio:inicio + TAMANHO_BLOCO]
+        # Row i of the padded array holds the window ending at original row i
+        janelas = preenchido[bloco[:, None] + deslocamentos]
+
+        # Masks the positions that belong to the previous ticker or to the padding
+        posicoes = bloco[:, None] - (janela - 1) + deslocamentos
+        janelas[posicoes < inicio_grupos[bloco, None]] = np.nan
+
+        with warnings.catch_warnings():
+            # All-NaN windows are expected for the first rows of each ticker
+            warnings.simplefilter('ignore', RuntimeWarning)
+            resultado[inicio:inicio + len(bloco)] = funcao(janelas, axis=1)
+
+    tamanho = np.minimum(alvos - inicio_grupos[alvos] + 1, janela)
+    resultado[tamanho < minimo] = np.nan
+    return resultado
+
+
+def atualizar_camada_curated(
+    df_indicadores: pd.DataFrame,
+    df_precos: pd.DataFrame,
+    bucket_name: str,
+    data_ingestao: str,
+) -> bool:
+    """
+    Runs the daily incremental job: loads the rolling state from S3, computes the
+    metrics for the new rows and writes both the curated partition and the new state.
+
+    Args:
+        df_indicadores (pd.DataFrame): The day's raw indicators.
+        df_precos (pd.DataFrame): The day's raw price snapshot.
+        bucket_name (str): The data lake bucket.
+        data_ingestao (str): Partition date in ISO format (e.g., '2025-01-31').
+
+    Returns:
+        bool: True if the curated partition and the state were written.
+    """
+    # Imported here so the calculations can be used without boto3 installed
+    from fiiscraper.aws_uploader import read_parquet_from_s3, upload_df_to_s3
+
+    try:
+        # None only when there is no state yet (first run)
+        estado = read_parquet_from_s3(bucket_name, CHAVE_ESTADO_S3)
+    except Exception as e:
+        # Starting from an empty state would truncate every window and overwrite the history
+        log.error(f"Could not read the rolling state, skipping the curated update: {e}")
+        return False
+    if estado is None:
+        log.info("No rolling state found, starting from an empty history.")
+    analytics = RollingAnalytics(estado=estado)
+
+    metricas = analytics.processar(preparar_entrada(df_indicadores, df_precos))
+    if metricas.empty:
+        return False
+
+    nome_arquivo_s3 = f'curated/rolling_metrics/ingest_date={data_ingestao}/data_parquet'
+    if not upload_df_to_s3(df=metricas, bucket_name=bucket_name, s3_filename=nome_arquivo_s3):
+        return False
+
+    # The state only advances once its output is safely stored
+    return upload_df_to_s3(df=analytics.estado, bucket_name=bucket_name, s3_filename=CHAVE_ESTADO_S3)
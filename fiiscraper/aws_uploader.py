@@ -2,7 +2,11 @@ import boto3
 from botocore.exceptions import NoCredentialsError, ClientError
 import logging
 import pandas as pd
+import numpy as np
 import io  # Required for the in-memory buffer
+import hashlib
+import json
+import uuid
 
 # Logging configuration to see informational and error messages
 logging.basicConfig(
@@ -10,20 +14,86 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Metadata entry (x-amz-meta-content-sha256) holding the hash of the uploaded data
+METADATA_HASH_KEY = 'content-sha256'
 
-def upload_df_to_s3(df: pd.DataFrame, bucket_name: str, s3_filename: str) -> bool:
+# Suffix of the temporary keys used before the commit step
+TEMP_KEY_SUFFIX = '.tmp-'
+
+# Marker left in a partition whose upload was skipped because another partition
+# holds the same data. The leading underscore hides it from Hive-style readers.
+ALIAS_MARKER_NAME = '_alias.json'
+
+# Counters of the uploads done and skipped since the last reset
+UPLOAD_STATS = {
+    'puts': 0,
+    'puts_skipped': 0,
+    'bytes_uploaded': 0,
+    'bytes_skipped': 0,
+}
+
+
+def compute_content_hash(df: pd.DataFrame) -> str:
+    """
+    Computes a stable hash of the logical content of a DataFrame.
+
+    The hash does not depend on row or column order (the FII list comes from a
+    set, so its order changes between runs) nor on the Parquet encoding, only
+    on the column names, dtypes and values.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to be hashed.
+
+    Returns:
+        str: The hex SHA-256 digest.
+    """
+    df = df[sorted(df.columns)]
+    # One 64-bit hash per row, sorted so the row order does not matter
+    row_hashes = np.sort(pd.util.hash_pandas_object(df, index=False).to_numpy())
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[col, str(df[col].dtype)] for col in df.columns]).encode())
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()
+
+
+def get_upload_stats() -> dict:
+    """Returns a copy of the upload counters (PUTs and bytes sent or saved)."""
+    return dict(UPLOAD_STATS)
+
+
+def reset_upload_stats():
+    """Zeroes the upload counters, e.g. at the start of a warm Lambda invocation."""
+    for key in UPLOAD_STATS:
+        UPLOAD_STATS[key] = 0
+
+
+def upload_df_to_s3(df: pd.DataFrame, bucket_name: str, s3_filename: str, manifest_key: str = None,
+                    chunk_rows: int = None) -> bool:
     """
     Converts a pandas DataFrame to Parquet in memory and uploads it to S3.
 
     This is the optimized approach that avoids saving temporary files to disk.
+    The upload is skipped (no encoding, no PUT) when the content hash matches
+    the one stored in the existing object's metadata or, if `manifest_key` is
+    given, the last upload recorded in that manifest. In the latter case an alias
+    marker pointing to the partition that holds the data is written next to
+    `s3_filename`, so a skipped partition can be told apart from a failed run.
+    Writes go to a temporary key first and are only copied to `s3_filename` once
+    complete.
 
     Args:
         df (pd.DataFrame): The DataFrame to be uploaded.
         bucket_name (str): The name of the destination S3 bucket.
         s3_filename (str): The name (path) the file will have in S3.
+        manifest_key (str): Optional JSON manifest shared by a dataset's partitions,
+                            used to skip snapshots identical to the previous one.
+        chunk_rows (int): Optional number of rows per Parquet row group. When given,
+                          the DataFrame is encoded block by block instead of as one
+                          Arrow table, lowering the peak memory.
 
     Returns:
-        bool: True if the upload was successful, False otherwise.
+        bool: True if the upload was successful or not needed, False otherwise.
     """
     # Creates an S3 client. Boto3 will automatically look for credentials
     # in your environment (configured via 'aws configure' or an IAM Role on Lambda).
@@ -35,23 +105,71 @@ def upload_df_to_s3(df: pd.DataFrame, bucket_name: str, s3_filename: str) -> boo
     )
     logging.info(log_message)
 
+    temp_key = f"{s3_filename}{TEMP_KEY_SUFFIX}{uuid.uuid4().hex}"
     try:
+        content_hash = compute_content_hash(df)
+
+        # Same key already holds the same data (re-runs and retries)
+        existing = _head_object(s3_client, bucket_name, s3_filename)
+        if existing and existing.get('Metadata', {}).get(METADATA_HASH_KEY) == content_hash:
+            logging.info("Content unchanged since the last upload to this key. Skipping upload.")
+            _record_skipped_upload(existing.get('ContentLength', 0))
+            return True
+
+        # Another partition of the dataset already holds the same data (weekends, holidays)
+        manifest = _read_manifest(s3_client, bucket_name, manifest_key) if manifest_key else {}
+        if manifest.get('content_hash') == content_hash:
+            logging.info(f"Content identical to '{manifest.get('key')}'. Skipping upload.")
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=_alias_marker_key(s3_filename),
+                Body=json.dumps({'alias_of': manifest.get('key'), 'content_hash': content_hash}).encode(),
+                ContentType='application/json'
+            )
+            _record_skipped_upload(manifest.get('size', 0))
+            return True
+
         # Creates an in-memory bytes buffer
         buffer_parquet = io.BytesIO()
 
         # Writes the DataFrame to the buffer in Parquet format
-        df.to_parquet(buffer_parquet, index=False)
+        if chunk_rows and len(df) > chunk_rows:
+            _write_parquet_in_chunks(df, buffer_parquet, chunk_rows)
+        else:
+            df.to_parquet(buffer_parquet, index=False)
+        size = buffer_parquet.tell()
 
         # "Rewinds" the buffer to the beginning before reading its content for the upload
         buffer_parquet.seek(0)
 
-        # Uses put_object to send the buffer's content (the bytes)
+        # Uploads to a temporary key, so a failed run never leaves a truncated object
         s3_client.put_object(
             Bucket=bucket_name,
-            Key=s3_filename,
+            Key=temp_key,
             Body=buffer_parquet
         )
 
+        # Commit step: the final key only appears once the object is complete
+        s3_client.copy_object(
+            Bucket=bucket_name,
+            Key=s3_filename,
+            CopySource={'Bucket': bucket_name, 'Key': temp_key},
+            Metadata={METADATA_HASH_KEY: content_hash},
+            MetadataDirective='REPLACE'
+        )
+        s3_client.delete_object(Bucket=bucket_name, Key=temp_key)
+
+        if manifest_key:
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=manifest_key,
+                Body=json.dumps({'content_hash': content_hash, 'key': s3_filename, 'size': size}).encode()
+            )
+            # The partition now holds its own data, so an alias left by an earlier run is stale
+            s3_client.delete_object(Bucket=bucket_name, Key=_alias_marker_key(s3_filename))
+
+        UPLOAD_STATS['puts'] += 1
+        UPLOAD_STATS['bytes_uploaded'] += size
         logging.info("Upload successful!")
         return True
     except NoCredentialsError:
@@ -59,6 +177,177 @@ def upload_df_to_s3(df: pd.DataFrame, bucket_name: str, s3_filename: str) -> boo
         return False
     except ClientError as e:
         # Handles specific AWS API errors, like "Bucket Not Found"
+        logging.error(f"An AWS error occurred: {e}")
+        _remove_temp_object(s3_client, bucket_name, temp_key)
+        return False
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during the upload: {e}")
+        _remove_temp_object(s3_client, bucket_name, temp_key)
+        return False
+
+
+def _write_parquet_in_chunks(df: pd.DataFrame, buffer: io.BytesIO, chunk_rows: int):
+    """Encodes the DataFrame one row group at a time, so only one block is converted to Arrow at once."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # A single schema for every block, so an all-null block does not change the types
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            block = df.iloc[start:start + chunk_rows]
+            writer.write_table(pa.Table.from_pandas(block, schema=schema, preserve_index=False))
+
+
+def _head_object(s3_client, bucket_name: str, s3_filename: str) -> dict | None:
+    """Returns the object's metadata, or None if it does not exist or cannot be read."""
+    try:
+        return s3_client.head_object(Bucket=bucket_name, Key=s3_filename)
+    except ClientError as e:
+        # The check is only an optimization, so any error means "upload it"
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            logging.warning(f"Could not read the metadata of '{s3_filename}': {e}")
+        return None
+
+
+def _read_manifest(s3_client, bucket_name: str, manifest_key: str) -> dict:
+    """Reads a dataset manifest, returning an empty dict if it does not exist or cannot be read."""
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=manifest_key)
+        manifest = json.loads(response['Body'].read())
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            logging.warning(f"Could not read the manifest '{manifest_key}': {e}")
+        return {}
+    except (ValueError, KeyError) as e:
+        # The manifest is only an optimization: a corrupt one means "upload it",
+        # and the next successful upload rewrites it
+        logging.warning(f"Ignoring the unreadable manifest '{manifest_key}': {e}")
+        return {}
+    if not isinstance(manifest, dict):
+        logging.warning(f"Ignoring the unexpected manifest '{manifest_key}'.")
+        return {}
+    return manifest
+
+
+def _alias_marker_key(s3_filename: str) -> str:
+    """Key of the alias marker in the partition of `s3_filename`."""
+    partition = s3_filename.rsplit('/', 1)[0]
+    return f"{partition}/{ALIAS_MARKER_NAME}"
+
+
+def _record_skipped_upload(size: int):
+    UPLOAD_STATS['puts_skipped'] += 1
+    UPLOAD_STATS['bytes_skipped'] += size
+
+
+def _remove_temp_object(s3_client, bucket_name: str, temp_key: str):
+    """Best-effort cleanup of the temporary key left by a failed upload."""
+    try:
+        s3_client.delete_object(Bucket=bucket_name, Key=temp_key)
+    except Exception as e:
+        logging.warning(f"Could not remove the temporary object '{temp_key}': {e}")
+
+
+def read_parquet_from_s3(bucket_name: str, s3_filename: str) -> pd.DataFrame | None:
+    """
+    Downloads a Parquet object from S3 and reads it into a pandas DataFrame.
+
+    Only a missing object returns None. Any other failure (permissions, throttling,
+    credentials, a corrupt object) is raised, so callers that keep state in S3 can
+    tell "no state yet" apart from "state could not be read".
+
+    Args:
+        bucket_name (str): The name of the source S3 bucket.
+        s3_filename (str): The name (path) of the file in S3.
+
+    Returns:
+        pd.DataFrame | None: The DataFrame, or None if the object does not exist.
+
+    Raises:
+        NoCredentialsError: If the AWS credentials are not found.
+        ClientError: On any AWS error other than a missing key.
+        Exception: If the object cannot be parsed as Parquet.
+    """
+    s3_client = boto3.client('s3')
+
+    logging.info(f"Reading Parquet from 's3://{bucket_name}/{s3_filename}'...")
+
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=s3_filename)
+        return pd.read_parquet(io.BytesIO(response['Body'].read()))
+    except NoCredentialsError:
+        logging.error("Error: AWS credentials not found.")
+        raise
+    except ClientError as e:
+        # A missing key is expected on the first run, so it is not an error
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            logging.info("Object not found.")
+            return None
+        logging.error(f"An AWS error occurred: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during the download: {e}")
+        raise
+
+
+def list_s3_prefixes(bucket_name: str, prefix: str) -> list[str]:
+    """
+    Lists the partition "folders" directly under a prefix in S3.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        prefix (str): The parent prefix, ending with '/' (e.g., 'raw/daily_indicators/').
+
+    Returns:
+        list[str]: The partition names (e.g., ['ingest_date=2025-01-31']), empty on error.
+    """
+    s3_client = boto3.client('s3')
+
+    try:
+        paginator = s3_client.get_paginator('list_objects_v2')
+        particoes = []
+        for pagina in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter='/'):
+            for item in pagina.get('CommonPrefixes', []):
+                particoes.append(item['Prefix'][len(prefix):].rstrip('/'))
+        return particoes
+    except NoCredentialsError:
+        logging.error("Error: AWS credentials not found.")
+        return []
+    except ClientError as e:
+        logging.error(f"An AWS error occurred: {e}")
+        return []
+    except Exception as e:
+        logging.error(f"An unexpected error occurred while listing '{prefix}': {e}")
+        return []
+
+
+def upload_json_to_s3(data: dict, bucket_name: str, s3_filename: str) -> bool:
+    """
+    Uploads a small JSON document (e.g., a report) to S3.
+
+    Args:
+        data (dict): A JSON-serializable dictionary.
+        bucket_name (str): The name of the destination S3 bucket.
+        s3_filename (str): The name (path) the file will have in S3.
+
+    Returns:
+        bool: True if the upload was successful, False otherwise.
+    """
+    s3_client = boto3.client('s3')
+
+    try:
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=s3_filename,
+            Body=json.dumps(data, ensure_ascii=False).encode('utf-8'),
+            ContentType='application/json'
+        )
+        return True
+    except NoCredentialsError:
+        logging.error("Error: AWS credentials not found.")
+        return False
+    except ClientError as e:
         logging.error(f"An AWS error occurred: {e}")
         return False
     except Exception as e:
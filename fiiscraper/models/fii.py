@@ -1,3 +1,14 @@
+# Field classification shared by the screener and the data quality checks.
+# Every field not listed here is numeric.
+
+# Categorical fields (a small set of distinct values)
+COLUNAS_CATEGORICAS = ['segmento', 'mandato', 'tipo_gestao']
+
+# Fields that are neither numeric nor categorical
+COLUNAS_TEXTO = ['ticker', 'nome', 'data_ult_cotacao', 'data_ult_relatorio_gerencial',
+                 'data_ult_info_trimestral', 'tem_dados_yfinance']
+
+
 class FII:
     def __init__(self, ticker):
 
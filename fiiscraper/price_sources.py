@@ -0,0 +1,218 @@
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import requests
+
+# Creates a logger instance. The setup is done in main.py.
+log = logging.getLogger(__name__)
+
+# Columns every price source returns, plus the 'fonte' column added by the fetcher
+COLUNAS_PRECO = ['ticker', 'date', 'open', 'high', 'low', 'close', 'volume']
+
+
+class PriceSource(ABC):
+    """
+    Base class for the sources of the latest closing price of a list of tickers.
+
+    Subclasses implement `buscar_precos` and must return a DataFrame with at
+    least the columns in COLUNAS_PRECO, or an empty DataFrame on any error.
+    """
+    nome = None
+
+    @abstractmethod
+    def buscar_precos(self, tickers: list[str]) -> pd.DataFrame:
+        """Returns the latest price of each ticker found."""
+
+
+class YFinanceSource(PriceSource):
+    """Prices from yfinance, through the scraper's single batch download."""
+    nome = 'yfinance'
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+
+    def buscar_precos(self, tickers: list[str]) -> pd.DataFrame:
+        return self.scraper.buscar_precos_em_lote(tickers)
+
+
+class BrapiSource(PriceSource):
+    """
+    Prices from the brapi.dev quote API.
+
+    Tickers are grouped into comma-separated batches (one request per batch) and
+    the batches are fetched concurrently.
+    """
+    nome = 'brapi'
+
+    def __init__(self, url_base: str, token: str = None, tamanho_lote: int = 10,
+                 max_workers: int = 4, timeout: int = 10, headers: dict = None):
+        self.url_base = url_base
+        self.token = token
+        self.tamanho_lote = tamanho_lote
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    # --- PUBLIC METHODS ---
+
+    def buscar_precos(self, tickers: list[str]) -> pd.DataFrame:
+        """
+        Fetches the latest quote for a list of tickers.
+
+        Args:
+            tickers (list[str]): A list of FII tickers (e.g., ['MXRF11', 'HGLG11']).
+
+        Returns:
+            pd.DataFrame: One row per ticker found, empty if nothing was found.
+        """
+        log.info(f"Fetching recent prices for {len(tickers)} tickers via brapi...")
+        if not tickers:
+            return pd.DataFrame()
+
+        lotes = [tickers[i:i + self.tamanho_lote] for i in range(0, len(tickers), self.tamanho_lote)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            resultados = list(executor.map(self._buscar_lote, lotes))
+
+        linhas = [linha for resultado in resultados for linha in resultado]
+        if not linhas:
+            return pd.DataFrame()
+
+        df_final = pd.DataFrame(linhas, columns=COLUNAS_PRECO).dropna(subset=['close'])
+        df_final = df_final.drop_duplicates(subset=['ticker'], keep='last').reset_index(drop=True)
+        log.info(f"  > Prices for {len(df_final)} tickers successfully found via brapi.")
+        return df_final
+
+    # --- PRIVATE METHODS ---
+
+    def _buscar_lote(self, lote: list[str]) -> list[dict]:
+        """Makes one request for a batch of tickers and returns the parsed rows."""
+        url = f"{self.url_base}{','.join(lote)}"
+        params = {'token': self.token} if self.token else None
+        try:
+            response = requests.get(url, params=params, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            resultados = response.json().get('results', [])
+        except (requests.RequestException, ValueError) as e:
+            log.error(f"  > Error fetching the brapi batch {lote}: {e}")
+            return []
+
+        linhas = []
+        for item in resultados:
+            data = pd.to_datetime(item.get('regularMarketTime'), errors='coerce', utc=True)
+            linhas.append({
+                'ticker': item.get('symbol'),
+                'date': None if pd.isna(data) else data.strftime('%Y-%m-%d'),
+                'open': item.get('regularMarketOpen'),
+                'high': item.get('regularMarketDayHigh'),
+                'low': item.get('regularMarketDayLow'),
+                'close': item.get('regularMarketPrice'),
+                'volume': item.get('regularMarketVolume'),
+            })
+        return linhas
+
+
+class HedgedPriceFetcher:
+    """
+    Fetches prices from a primary source, hedging with a secondary one.
+
+    The secondary source is only started when the primary has not answered
+    within `limiar_latencia` seconds (or answered with nothing); the first
+    non-empty answer wins. Tickers missing from the winner are then filled
+    from the other source, and the source of each row is recorded in the
+    'fonte' column.
+    """
+    def __init__(self, primaria: PriceSource, secundaria: PriceSource,
+                 limiar_latencia: float = 5.0, timeout_complemento: float = 30.0):
+        self.primaria = primaria
+        self.secundaria = secundaria
+        self.limiar_latencia = limiar_latencia
+        self.timeout_complemento = timeout_complemento
+
+    # --- PUBLIC METHODS ---
+
+    def buscar_precos(self, tickers: list[str]) -> pd.DataFrame:
+        """
+        Fetches the latest price for every ticker, from whichever source answers.
+
+        Args:
+            tickers (list[str]): A list of FII tickers.
+
+        Returns:
+            pd.DataFrame: The prices with a 'fonte' column, empty if no source answered.
+        """
+        if not tickers:
+            return pd.DataFrame()
+
+        # Not used as a context manager: leaving it would wait for the slow source
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            futuros = {executor.submit(self._buscar, self.primaria, tickers): self.primaria}
+            feitos, _ = wait(futuros, timeout=self.limiar_latencia)
+            if not feitos or all(futuro.result().empty for futuro in feitos):
+                log.info(f"  > {self.primaria.nome} slower than {self.limiar_latencia}s or empty, "
+                         f"hedging with {self.secundaria.nome}...")
+                futuros[executor.submit(self._buscar, self.secundaria, tickers)] = self.secundaria
+
+            vencedor, resultado = self._primeiro_nao_vazio(futuros, executor, tickers)
+            if vencedor is None:
+                log.error("  > No price source returned data.")
+                return pd.DataFrame()
+
+            log.info(f"  > Price request won by {vencedor.nome}.")
+            faltantes = sorted(set(tickers) - set(resultado['ticker']))
+            if faltantes:
+                complemento = self._complementar(futuros, vencedor, faltantes)
+                if not complemento.empty:
+                    resultado = pd.concat([resultado, complemento], ignore_index=True)
+
+            return resultado.reset_index(drop=True)
+        finally:
+            executor.shutdown(wait=False)
+
+    # --- PRIVATE METHODS ---
+
+    def _buscar(self, fonte: PriceSource, tickers: list[str]) -> pd.DataFrame:
+        """Calls a source, never raising, and tags its rows with the source name."""
+        try:
+            df = fonte.buscar_precos(tickers)
+        except Exception as e:
+            log.error(f"  > Price source {fonte.nome} failed: {e}")
+            return pd.DataFrame()
+        if df.empty:
+            return pd.DataFrame()
+        return df.assign(fonte=fonte.nome)
+
+    def _primeiro_nao_vazio(self, futuros: dict, executor, tickers: list[str]):
+        """Waits for the first source with data, starting the secondary if the primary fails."""
+        pendentes = set(futuros)
+        while pendentes:
+            feitos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                if not futuro.result().empty:
+                    return futuros[futuro], futuro.result()
+
+            # The primary answered empty before the hedge was started
+            if not pendentes and self.secundaria not in futuros.values():
+                futuro = executor.submit(self._buscar, self.secundaria, tickers)
+                futuros[futuro] = self.secundaria
+                pendentes = {futuro}
+        return None, None
+
+    def _complementar(self, futuros: dict, vencedor: PriceSource, faltantes: list[str]) -> pd.DataFrame:
+        """Gets the tickers missing from the winner out of the other source."""
+        outra = self.secundaria if vencedor is self.primaria else self.primaria
+        log.info(f"  > Filling {len(faltantes)} missing tickers from {outra.nome}...")
+
+        em_andamento = [f for f, fonte in futuros.items() if fonte is outra]
+        if em_andamento:
+            # The other source is already fetching every ticker, reuse its answer
+            feitos, _ = wait(em_andamento, timeout=self.timeout_complemento)
+            df = feitos.pop().result() if feitos else pd.DataFrame()
+        else:
+            df = self._buscar(outra, faltantes)
+
+        if df.empty:
+            return pd.DataFrame()
+        return df[df['ticker'].isin(faltantes)]
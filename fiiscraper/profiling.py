@@ -0,0 +1,223 @@
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# Creates a logger instance. The setup is done in main.py.
+log = logging.getLogger(__name__)
+
+# How often the RSS is sampled while a stage runs, in seconds
+INTERVALO_AMOSTRAGEM = 0.01
+
+# Number of allocation sites kept per stage
+TOP_ALOCACOES = 5
+
+# Copies alive at the peak of the indicators path: typed frame, string copy,
+# Arrow table and Parquet buffer
+FATOR_PICO = 4.0
+
+# Rows per block in the low-memory mode
+TAMANHO_BLOCO = 100
+
+# Share of the Lambda memory used as the default budget, leaving room for the runtime
+FRACAO_MEMORIA_LAMBDA = 0.8
+
+
+def _rss_mb() -> float | None:
+    """Current resident set size in MB, or None where /proc is not available (e.g., Windows)."""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemoryProfiler:
+    """
+    Opt-in memory profiling of the pipeline stages, plus a memory budget guard.
+
+    When active, each stage records its peak RSS (sampled in a background
+    thread), its tracemalloc peak and the sites that allocated the most during
+    the stage (still alive at its end). When inactive
+    the stage hooks do nothing, so they can stay in the pipeline code.
+    """
+    def __init__(self, ativo: bool = None, orcamento_mb: float = None):
+        if ativo is None:
+            ativo = os.environ.get('PERFIL_MEMORIA', 'false').lower() == 'true'
+        self.ativo = ativo
+        self.orcamento_mb = orcamento_mb if orcamento_mb is not None else _orcamento_padrao_mb()
+
+        self.etapas = []
+        self._etapa_atual = None
+        self._pico_rss = None
+        self._snapshot_inicio = None
+        self._parar_amostragem = threading.Event()
+        self._amostrador = None
+
+    # --- PUBLIC METHODS ---
+
+    def marcar(self, nome: str):
+        """
+        Ends the current stage (if any) and starts a new one.
+
+        Args:
+            nome (str): The name of the stage that starts now.
+        """
+        self.finalizar()
+        if not self.ativo:
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        # Compared at the end of the stage, so objects kept alive by earlier stages are left out
+        self._snapshot_inicio = _snapshot()
+
+        self._etapa_atual = {'etapa': nome, 'inicio': time.perf_counter(), 'rss_inicio_mb': _rss_mb()}
+        self._pico_rss = self._etapa_atual['rss_inicio_mb']
+        self._parar_amostragem.clear()
+        self._amostrador = threading.Thread(target=self._amostrar_rss, daemon=True)
+        self._amostrador.start()
+
+    def finalizar(self):
+        """Ends the current stage and records its measurements."""
+        if self._etapa_atual is None:
+            return
+
+        self._parar_amostragem.set()
+        self._amostrador.join()
+
+        _, pico_traced = tracemalloc.get_traced_memory()
+        diferencas = _snapshot().compare_to(self._snapshot_inicio, 'lineno')
+        estatisticas = sorted((d for d in diferencas if d.size_diff > 0), key=lambda d: d.size_diff, reverse=True)
+        estatisticas = estatisticas[:TOP_ALOCACOES]
+        self._snapshot_inicio = None
+
+        etapa = self._etapa_atual
+        etapa['duracao_s'] = round(time.perf_counter() - etapa.pop('inicio'), 3)
+        etapa['rss_pico_mb'] = None if self._pico_rss is None else round(self._pico_rss, 1)
+        etapa['tracemalloc_pico_mb'] = round(pico_traced / 2**20, 1)
+        etapa['top_alocacoes'] = [
+            {'local': str(stat.traceback[0]), 'mb': round(stat.size_diff / 2**20, 2)} for stat in estatisticas
+        ]
+        self.etapas.append(etapa)
+        self._etapa_atual = None
+
+    def resumo(self) -> list[dict]:
+        """The measurements of every finished stage, in order."""
+        self.finalizar()
+        return list(self.etapas)
+
+    def registrar_resumo(self):
+        """Logs one line per stage, for the run summary."""
+        for etapa in self.resumo():
+            log.info(
+                f"Memory [{etapa['etapa']}]: peak RSS {etapa['rss_pico_mb']} MB, "
+                f"peak traced {etapa['tracemalloc_pico_mb']} MB in {etapa['duracao_s']}s. "
+                f"Top: {', '.join(a['local'] for a in etapa['top_alocacoes'][:3])}"
+            )
+        if self.ativo:
+            tracemalloc.stop()
+
+    def projetar_pico_mb(self, amostra: pd.DataFrame, n_linhas: int) -> float:
+        """
+        Projects the peak RSS of turning `n_linhas` rows into a Parquet upload,
+        from the in-memory size of a sample of those rows.
+
+        Args:
+            amostra (pd.DataFrame): A few rows of the data to be processed.
+            n_linhas (int): The total number of rows.
+
+        Returns:
+            float: The projected peak in MB.
+        """
+        if amostra.empty:
+            return _rss_mb() or 0.0
+        bytes_por_linha = amostra.memory_usage(deep=True).sum() / len(amostra)
+        return (_rss_mb() or 0.0) + FATOR_PICO * bytes_por_linha * n_linhas / 2**20
+
+    def usar_modo_em_blocos(self, amostra: pd.DataFrame, n_linhas: int) -> bool:
+        """
+        True when the projected peak exceeds the memory budget, meaning the data
+        should be built and encoded in blocks.
+        """
+        if self.orcamento_mb is None:
+            return False
+        pico = self.projetar_pico_mb(amostra, n_linhas)
+        if pico > self.orcamento_mb:
+            log.warning(f"Projected peak of {pico:.0f} MB exceeds the {self.orcamento_mb:.0f} MB budget. "
+                        f"Switching to the low-memory block mode.")
+            return True
+        return False
+
+    # --- PRIVATE METHODS ---
+
+    def _amostrar_rss(self):
+        """Keeps the highest RSS seen until the stage ends."""
+        while not self._parar_amostragem.wait(INTERVALO_AMOSTRAGEM):
+            rss = _rss_mb()
+            if rss is not None and (self._pico_rss is None or rss > self._pico_rss):
+                self._pico_rss = rss
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    """Current tracemalloc snapshot, without the allocations of tracemalloc itself."""
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def montar_df_em_blocos(fiis: list, tamanho_bloco: int = TAMANHO_BLOCO) -> pd.DataFrame:
+    """
+    Low-memory equivalent of `pd.DataFrame([vars(fii) for fii in fiis]).astype(str)`.
+
+    Each block is converted to strings right away, so the full `vars()` list and
+    the full typed frame never coexist with the string copy. Every block is built
+    with the dtypes the full frame would have, so a column that is null in a whole
+    block is converted like in the full frame (e.g., 'nan', not 'None').
+
+    Args:
+        fiis (list[FII]): The FIIs to convert.
+        tamanho_bloco (int): Rows per block.
+
+    Returns:
+        pd.DataFrame: All columns as strings, like the raw layer.
+    """
+    if not fiis:
+        return pd.DataFrame()
+
+    tipos = _tipos_do_df_completo(fiis)
+    blocos = []
+    for i in range(0, len(fiis), tamanho_bloco):
+        registros = [vars(fii) for fii in fiis[i:i + tamanho_bloco]]
+        bloco = pd.DataFrame({
+            coluna: pd.Series([registro.get(coluna) for registro in registros], dtype=tipo)
+            for coluna, tipo in tipos.items()
+        })
+        blocos.append(bloco.astype(str))
+    return pd.concat(blocos, ignore_index=True)
+
+
+def _tipos_do_df_completo(fiis: list) -> dict:
+    """
+    The dtype pandas would infer for each column of the full frame.
+
+    The inference only depends on which Python types a column holds, so it is
+    run over one value of each type seen instead of the whole column.
+    """
+    exemplos = {}
+    for fii in fiis:
+        for coluna, valor in vars(fii).items():
+            exemplos.setdefault(coluna, {}).setdefault(type(valor), valor)
+    return {coluna: pd.Series(list(por_tipo.values())).dtype for coluna, por_tipo in exemplos.items()}
+
+
+def _orcamento_padrao_mb() -> float | None:
+    """MEMORIA_ORCAMENTO_MB, or a share of the Lambda memory size when running on Lambda."""
+    if os.environ.get('MEMORIA_ORCAMENTO_MB'):
+        return float(os.environ['MEMORIA_ORCAMENTO_MB'])
+    if os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE'):
+        return float(os.environ['AWS_LAMBDA_FUNCTION_MEMORY_SIZE']) * FRACAO_MEMORIA_LAMBDA
+    return None
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+# Creates a logger instance. The setup is done in main.py.
+log = logging.getLogger(__name__)
+
+# Refresh tiers: (last rank in the tier, refresh interval in seconds).
+# None closes the list with the long tail.
+TIERS_PADRAO = [
+    (50, 60 * 60),          # Top-50 by priority: hourly
+    (200, 4 * 60 * 60),     # Next 150: every 4 hours
+    (None, 24 * 60 * 60),   # Long tail: daily
+]
+
+# Fetches per hour the default tiers need: 50 hourly + 150 every 4 hours (~88).
+# The intraday budget (ORCAMENTO_INTRADIARIO) should not be lower, or the top
+# tiers fall behind their intervals
+ORCAMENTO_PADRAO = 90
+
+# Seconds a ticker may be early and still be due, so that the jitter of the
+# hourly trigger does not push an hourly ticker to the next run
+TOLERANCIA_VENCIMENTO = 5 * 60
+
+# Weight of the latest observation in the change frequency (exponential average)
+PESO_MUDANCA = 0.3
+
+# Where the due-queue is persisted between invocations
+CHAVE_ESTADO_S3 = 'raw/_state/refresh_scheduler/state_parquet'
+
+# Columns of the persisted due-queue
+COLUNAS_ESTADO = ['ticker', 'volume_medio_2meses', 'frequencia_mudanca',
+                  'ultima_atualizacao', 'hash_conteudo']
+
+
+class RefreshScheduler:
+    """
+    Decides which FIIs to refresh on each intraday invocation.
+
+    Tickers are ranked by `volume_medio_2meses`, boosted by how often their
+    data changed in recent refreshes, and each rank tier gets a refresh
+    interval. Every invocation gets a budget of fetches and is filled with the
+    most overdue tickers, relative to their interval. The state is a plain
+    DataFrame, so it can be persisted as Parquet like any other dataset.
+    """
+    def __init__(self, estado: pd.DataFrame = None, tiers: list = None, relogio=time.time):
+        self.tiers = tiers or TIERS_PADRAO
+        # Injectable so the schedule can be simulated with a fake clock
+        self.relogio = relogio
+
+        if estado is None:
+            estado = pd.DataFrame(columns=COLUNAS_ESTADO)
+        self.estado = estado[COLUNAS_ESTADO].set_index('ticker')
+        self.estado = self.estado.astype({
+            'volume_medio_2meses': float, 'frequencia_mudanca': float, 'ultima_atualizacao': float,
+        })
+
+    # --- PUBLIC METHODS ---
+
+    def atualizar_universo(self, fiis: list):
+        """
+        Syncs the queue with the current FII list, adding new tickers (due
+        immediately) and dropping the ones no longer listed.
+
+        Args:
+            fiis (list[FII]): The listed FIIs. Their `volume_medio_2meses` is used
+                when available.
+        """
+        tickers = [fii.ticker for fii in fiis]
+        novos = [t for t in tickers if t not in self.estado.index]
+        removidos = self.estado.index.difference(tickers)
+
+        self.estado = self.estado.drop(index=removidos)
+        if novos:
+            linhas_novas = pd.DataFrame({
+                'volume_medio_2meses': np.nan, 'frequencia_mudanca': 0.0,
+                'ultima_atualizacao': np.nan, 'hash_conteudo': None,
+            }, index=pd.Index(novos, name='ticker'))
+            partes = [self.estado, linhas_novas] if not self.estado.empty else [linhas_novas]
+            self.estado = pd.concat(partes)
+        for fii in fiis:
+            if fii.volume_medio_2meses is not None:
+                self.estado.loc[fii.ticker, 'volume_medio_2meses'] = float(fii.volume_medio_2meses)
+
+        log.info(f"Scheduler universe: {len(self.estado)} tickers ({len(novos)} new, {len(removidos)} removed).")
+
+    def proximo_lote(self, orcamento: int) -> list[str]:
+        """
+        Picks the tickers to refresh in this invocation.
+
+        Args:
+            orcamento (int): Maximum number of fetches for this invocation.
+
+        Returns:
+            list[str]: Up to `orcamento` due tickers, most overdue first.
+        """
+        fila = self.fila()
+        # Overdue in seconds; never refreshed tickers stay infinitely overdue
+        atraso = fila['atraso_relativo'] * fila['intervalo']
+        vencidos = fila[atraso >= -TOLERANCIA_VENCIMENTO]
+        lote = vencidos.head(orcamento).index.tolist()
+        log.info(f"  > {len(vencidos)} tickers due, {len(lote)} selected for a budget of {orcamento}.")
+        return lote
+
+    def registrar_atualizacao(self, ticker: str, fii, momento: float = None):
+        """
+        Records the result of a refresh, updating the change frequency.
+
+        Args:
+            ticker (str): The refreshed ticker.
+            fii (FII): The fetched data, or None if the fetch failed. Failed
+                fetches are not rescheduled, so they stay due.
+            momento (float): When the refresh counts as done, in epoch seconds.
+                Pass the start of the invocation, so the time spent fetching
+                does not push the next refresh past the next invocation.
+                Defaults to now.
+        """
+        if fii is None or ticker not in self.estado.index:
+            return
+
+        novo_hash = _hash_fii(fii)
+        hash_anterior = self.estado.at[ticker, 'hash_conteudo']
+        mudou = 0.0 if hash_anterior == novo_hash else 1.0
+        # The first fetch is not a change, there is nothing to compare with
+        if hash_anterior is None or pd.isna(hash_anterior):
+            mudou = 0.0
+
+        frequencia = self.estado.at[ticker, 'frequencia_mudanca']
+        self.estado.at[ticker, 'frequencia_mudanca'] = (1 - PESO_MUDANCA) * frequencia + PESO_MUDANCA * mudou
+        self.estado.at[ticker, 'hash_conteudo'] = novo_hash
+        self.estado.at[ticker, 'ultima_atualizacao'] = self.relogio() if momento is None else momento
+        if fii.volume_medio_2meses is not None:
+            self.estado.at[ticker, 'volume_medio_2meses'] = float(fii.volume_medio_2meses)
+
+    def fila(self) -> pd.DataFrame:
+        """
+        Returns the due-queue: every ticker with its tier, interval and how
+        overdue it is relative to that interval (>= 0 means due; `proximo_lote`
+        also takes tickers up to TOLERANCIA_VENCIMENTO seconds early).
+        """
+        fila = self.estado.copy()
+        # Liquidity decides the order, frequent changes push a fund up
+        fila['prioridade'] = fila['volume_medio_2meses'].fillna(0) * (1 + fila['frequencia_mudanca'])
+        fila['rank'] = fila['prioridade'].rank(ascending=False, method='first')
+        fila['intervalo'] = self._intervalo_por_rank(fila['rank'].to_numpy())
+
+        # Never refreshed tickers are due right away, ahead of everything else
+        atraso = self.relogio() - fila['ultima_atualizacao'] - fila['intervalo']
+        fila['atraso_relativo'] = (atraso / fila['intervalo']).fillna(np.inf)
+
+        return fila.sort_values(['atraso_relativo', 'prioridade'], ascending=False, kind='mergesort')
+
+    def para_dataframe(self) -> pd.DataFrame:
+        """The state to be persisted (e.g., with `upload_df_to_s3`)."""
+        return self.estado.reset_index()[COLUNAS_ESTADO]
+
+    # --- PRIVATE METHODS ---
+
+    def _intervalo_por_rank(self, ranks: np.ndarray) -> np.ndarray:
+        """Maps each rank to its tier's refresh interval."""
+        intervalos = np.full(len(ranks), float(self.tiers[-1][1]))
+        limite_anterior = 0
+        for limite, intervalo in self.tiers:
+            if limite is None:
+                break
+            intervalos[(ranks > limite_anterior) & (ranks <= limite)] = intervalo
+            limite_anterior = limite
+        return intervalos
+
+
+def registrar_execucao_diaria(indicadores_fiis: list, bucket_name: str) -> bool:
+    """
+    Seeds the due-queue after the daily full run: every FII fetched today is
+    marked as fresh and its volume is updated, so the intraday runs that
+    follow only refresh what the tiers ask for.
+
+    Args:
+        indicadores_fiis (list[FII]): The FIIs fetched by the daily run (None entries are ignored).
+        bucket_name (str): The data lake bucket.
+
+    Returns:
+        bool: True if the state was saved.
+
+    Raises:
+        Exception: If the saved state exists but cannot be read. Seeding from an
+            empty queue would wipe the change frequencies.
+    """
+    # Imported here so the scheduler can be simulated without boto3 installed
+    from fiiscraper.aws_uploader import read_parquet_from_s3, upload_df_to_s3
+
+    fiis = [fii for fii in indicadores_fiis if fii is not None]
+    scheduler = RefreshScheduler(estado=read_parquet_from_s3(bucket_name, CHAVE_ESTADO_S3))
+    scheduler.atualizar_universo(fiis)
+    for fii in fiis:
+        scheduler.registrar_atualizacao(fii.ticker, fii)
+
+    return upload_df_to_s3(df=scheduler.para_dataframe(), bucket_name=bucket_name, s3_filename=CHAVE_ESTADO_S3)
+
+
+def executar_atualizacao_intradiaria(scraper, bucket_name: str, orcamento: int, relogio=time.time) -> list:
+    """
+    Runs one intraday invocation: fetches the most overdue FIIs within the
+    budget, uploads them and saves the updated due-queue.
+
+    Args:
+        scraper (Scraper): Used to fetch the indicators.
+        bucket_name (str): The data lake bucket.
+        orcamento (int): Maximum number of fetches for this invocation.
+        relogio (callable): Clock returning epoch seconds.
+
+    Returns:
+        list[FII]: The FIIs refreshed in this invocation.
+
+    Raises:
+        Exception: If the saved state exists but cannot be read.
+    """
+    from fiiscraper.aws_uploader import read_parquet_from_s3, upload_df_to_s3
+
+    estado = read_parquet_from_s3(bucket_name, CHAVE_ESTADO_S3)
+    if estado is None:
+        log.warning("No scheduler state yet, it is seeded by the daily run. Nothing to refresh.")
+        return []
+
+    scheduler = RefreshScheduler(estado=estado, relogio=relogio)
+    # Every ticker of the batch is stamped with the start of the invocation
+    inicio = relogio()
+    atualizados = []
+    for ticker in scheduler.proximo_lote(orcamento):
+        fii = scraper.buscar_indicadores_dia(ticker)
+        scheduler.registrar_atualizacao(ticker, fii, momento=inicio)
+        if fii is not None:
+            atualizados.append(fii)
+
+    if atualizados:
+        agora = pd.Timestamp(relogio(), unit='s')
+        df_indicadores = pd.DataFrame([vars(fii) for fii in atualizados]).astype(str)
+        nome_arquivo_s3 = (
+            f"raw/intraday_indicators/ingest_date={agora.date().isoformat()}"
+            f"/ingest_time={agora.strftime('%H%M')}/data_parquet"
+        )
+        upload_df_to_s3(df=df_indicadores, bucket_name=bucket_name, s3_filename=nome_arquivo_s3)
+
+    upload_df_to_s3(df=scheduler.para_dataframe(), bucket_name=bucket_name, s3_filename=CHAVE_ESTADO_S3)
+    log.info(f"Intraday refresh finished: {len(atualizados)} FIIs updated.")
+    return atualizados
+
+
+def _hash_fii(fii) -> str:
+    """Hash of an FII's fields, used to detect whether its data changed."""
+    conteudo = json.dumps(vars(fii), sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
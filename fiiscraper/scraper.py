@@ -2,9 +2,11 @@
 import requests
 from bs4 import BeautifulSoup
 from fiiscraper.models.fii import FII
+from fiiscraper.price_sources import BrapiSource, HedgedPriceFetcher, YFinanceSource
 import yfinance as yf
 import pandas as pd
 import logging
+import os
 import re
 
 # Creates a logger instance. The setup is done in main.py.
@@ -15,7 +17,7 @@ class Scraper:
     """
     Class responsible for fund (FII) data gathering from multiple sources.
     """
-    def __init__(self):
+    def __init__(self, limiar_latencia_precos: float = 5.0):
         # Source for the funds available for scraping
         self.url_lista_fiis = "https://www.fundamentus.com.br/fii_imoveis.php"
 
@@ -41,6 +43,14 @@ class Scraper:
             'Referer': 'https://www.fundamentus.com.br/fii_imoveis.php'
         }
 
+        # Price sources: yfinance first, hedged by brapi when it is slow or fails.
+        # The brapi token is optional (BRAPI_TOKEN), without it the free limits apply.
+        self.fonte_precos = HedgedPriceFetcher(
+            primaria=YFinanceSource(self),
+            secundaria=BrapiSource(self.url_base_api_precos, token=os.environ.get('BRAPI_TOKEN')),
+            limiar_latencia=limiar_latencia_precos
+        )
+
     # --- PUBLIC METHODS ---
 
     def listar_todos_fiis(self):
@@ -218,6 +228,20 @@ class Scraper:
             log.error(f"  > An error occurred during the batch download from yfinance: {e}")
             return pd.DataFrame()
 
+    def buscar_precos(self, tickers: list[str]) -> pd.DataFrame:
+        """
+        Fetches the most recent closing price for a list of tickers from yfinance,
+        falling back to (and filling gaps from) brapi.
+
+        Args:
+            tickers (list[str]): A list of FII tickers (e.g., ['MXRF11', 'HGLG11']).
+
+        Returns:
+            pd.DataFrame: Same columns as `buscar_precos_em_lote` plus 'fonte', the
+                  source of each row. Returns an empty DataFrame if no source answered.
+        """
+        return self.fonte_precos.buscar_precos(tickers)
+
     # --- PRIVATE METHODS ---
 
     def _buscar_html(self, url: str):
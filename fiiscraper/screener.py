@@ -0,0 +1,354 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from fiiscraper.models.fii import COLUNAS_CATEGORICAS, COLUNAS_TEXTO
+
+# Creates a logger instance. The setup is done in main.py.
+log = logging.getLogger(__name__)
+
+# Prefix of the raw partitions the screener reads from
+PREFIXO_INDICADORES = 'raw/daily_indicators/'
+
+
+class FIIScreener:
+    """
+    In-memory columnar index over the latest daily indicators snapshot.
+
+    Numeric fields are kept as float arrays with a sorted index (row ids ordered
+    by value), categorical fields as one boolean bitmap per value. Queries resolve
+    each filter through its index and only check the surviving candidates against
+    the remaining filters, so no query scans the whole snapshot.
+    """
+    def __init__(self, df: pd.DataFrame = None, particao: str = None):
+        self.particao = None
+        self.tickers = np.array([], dtype=object)
+        self.numericas = {}
+        self.indices_ordenados = {}
+        self.valores_ordenados = {}
+        self.categoricas = {}
+        self.bitmaps = {}
+
+        if df is not None:
+            self.carregar(df, particao)
+
+    @classmethod
+    def do_s3(cls, bucket_name: str) -> 'FIIScreener':
+        """
+        Creates a screener loaded with the latest daily indicators partition in S3.
+
+        Args:
+            bucket_name (str): The data lake bucket.
+        """
+        screener = cls()
+        screener.atualizar_do_s3(bucket_name)
+        return screener
+
+    # --- PUBLIC METHODS ---
+
+    def carregar(self, df: pd.DataFrame, particao: str = None):
+        """
+        Loads a snapshot, rebuilding every column and index from scratch.
+
+        Args:
+            df (pd.DataFrame): One row per FII, as written to the raw layer.
+            particao (str): Identifier of the partition (e.g., 'ingest_date=2025-01-31').
+        """
+        df = self._normalizar(df)
+        self.particao = particao
+        self.tickers = df['ticker'].to_numpy(dtype=object)
+
+        self.numericas = {}
+        self.indices_ordenados = {}
+        self.valores_ordenados = {}
+        for coluna in self._colunas_numericas(df):
+            valores = pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=float)
+            self._definir_numerica(coluna, valores)
+
+        self.categoricas = {}
+        self.bitmaps = {}
+        for coluna in COLUNAS_CATEGORICAS:
+            if coluna not in df.columns:
+                continue
+            valores = df[coluna].to_numpy(dtype=object)
+            self.categoricas[coluna] = valores
+            self.bitmaps[coluna] = {
+                valor: valores == valor for valor in pd.unique(valores) if not pd.isna(valor)
+            }
+
+        log.info(f"Screener loaded with {len(self.tickers)} FIIs from partition '{particao}'.")
+
+    def atualizar(self, df: pd.DataFrame, particao: str = None):
+        """
+        Applies a newer snapshot, only touching the rows and indexes that changed.
+
+        When the set of tickers or the indexed fields differ from the loaded
+        ones, the screener is rebuilt from scratch instead.
+
+        Args:
+            df (pd.DataFrame): The new snapshot, one row per FII.
+            particao (str): Identifier of the new partition.
+        """
+        df = self._normalizar(df)
+        colunas_indexadas = set(self.numericas) | set(self.categoricas)
+        if (len(df) != len(self.tickers) or set(df['ticker']) != set(self.tickers)
+                or not colunas_indexadas.issubset(df.columns)):
+            log.info("  > Ticker list or layout changed, rebuilding the screener.")
+            self.carregar(df, particao)
+            return
+
+        # Aligns the new snapshot to the row ids already in the indexes
+        df = df.set_index('ticker').loc[self.tickers].reset_index()
+        linhas_alteradas = 0
+
+        for coluna, antigos in self.numericas.items():
+            novos = pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=float)
+            alterados = np.flatnonzero(~((antigos == novos) | (np.isnan(antigos) & np.isnan(novos))))
+            if len(alterados):
+                self._reindexar_numerica(coluna, novos, alterados)
+                linhas_alteradas = max(linhas_alteradas, len(alterados))
+
+        for coluna, antigos in self.categoricas.items():
+            novos = df[coluna].to_numpy(dtype=object)
+            alterados = np.flatnonzero(antigos != novos)
+            if len(alterados):
+                self._reindexar_categorica(coluna, novos, alterados)
+                linhas_alteradas = max(linhas_alteradas, len(alterados))
+
+        self.particao = particao
+        log.info(f"Screener refreshed to partition '{particao}' ({linhas_alteradas} rows changed at most per field).")
+
+    def atualizar_do_s3(self, bucket_name: str) -> bool:
+        """
+        Loads the latest daily indicators partition if it is newer than the loaded one.
+
+        Args:
+            bucket_name (str): The data lake bucket.
+
+        Returns:
+            bool: True if a new partition was applied.
+        """
+        # Imported here so the screener can be used without boto3 installed
+        from fiiscraper.aws_uploader import list_s3_prefixes, read_parquet_from_s3
+
+        particoes = list_s3_prefixes(bucket_name, PREFIXO_INDICADORES)
+        if not particoes:
+            log.warning("No daily indicators partition found.")
+            return False
+
+        # ISO dates in the partition names sort chronologically
+        ultima = max(particoes)
+        if ultima == self.particao:
+            return False
+
+        try:
+            df = read_parquet_from_s3(bucket_name, f'{PREFIXO_INDICADORES}{ultima}/data_parquet')
+        except Exception as e:
+            # Keeps serving the loaded snapshot
+            log.error(f"Could not read partition '{ultima}': {e}")
+            return False
+        if df is None:
+            return False
+
+        if self.particao is None:
+            self.carregar(df, ultima)
+        else:
+            self.atualizar(df, ultima)
+        return True
+
+    def consultar(self, filtros: dict = None, ordenar_por: str = None,
+                  n: int = None, ascendente: bool = False) -> pd.DataFrame:
+        """
+        Answers a compound query over the loaded snapshot.
+
+        Numeric filters are `(minimo, maximo)` tuples meaning `minimo <= x < maximo`,
+        either bound may be None. Categorical filters are a value or a list of values.
+
+        Example:
+            screener.consultar({'p_vp': (None, 1), 'segmento': 'Logística'},
+                               ordenar_por='div_yield', n=10)
+
+        Args:
+            filtros (dict): Field name to filter.
+            ordenar_por (str): Numeric field used to rank the result.
+            n (int): Maximum number of rows returned (top-N when `ordenar_por` is set).
+            ascendente (bool): Ranks from the lowest value when True.
+
+        Returns:
+            pd.DataFrame: The matching FIIs with the filtered and ranked fields.
+        """
+        filtros = filtros or {}
+        candidatos = self._resolver_filtros(filtros)
+
+        if ordenar_por is not None:
+            ids = self._top_n(ordenar_por, candidatos, n, ascendente)
+        else:
+            ids = np.arange(len(self.tickers)) if candidatos is None else candidatos
+            ids = ids[:n] if n is not None else ids
+
+        colunas = list(dict.fromkeys(list(filtros) + ([ordenar_por] if ordenar_por else [])))
+        resultado = {'ticker': self.tickers[ids]}
+        for coluna in colunas:
+            resultado[coluna] = self._valores(coluna)[ids]
+        return pd.DataFrame(resultado)
+
+    # --- PRIVATE METHODS ---
+
+    def _normalizar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drops invalid rows and turns the 'None'/'nan' strings of the raw layer into nulls."""
+        df = df.replace({'None': None, 'nan': None})
+        return df.dropna(subset=['ticker']).drop_duplicates(subset=['ticker']).reset_index(drop=True)
+
+    def _colunas_numericas(self, df: pd.DataFrame) -> list[str]:
+        return [c for c in df.columns if c not in COLUNAS_CATEGORICAS and c not in COLUNAS_TEXTO]
+
+    def _valores(self, coluna: str) -> np.ndarray:
+        if coluna in self.numericas:
+            return self.numericas[coluna]
+        if coluna in self.categoricas:
+            return self.categoricas[coluna]
+        raise KeyError(f"Field '{coluna}' is not indexed by the screener.")
+
+    def _definir_numerica(self, coluna: str, valores: np.ndarray):
+        """Stores a numeric column with its sorted index (row ids of the non-null values, ordered by value)."""
+        ids = np.flatnonzero(~np.isnan(valores))
+        indice = ids[np.argsort(valores[ids], kind='stable')]
+        self.numericas[coluna] = valores
+        self.indices_ordenados[coluna] = indice
+        # Kept next to the index, so range queries search it without gathering the column
+        self.valores_ordenados[coluna] = valores[indice]
+
+    def _reindexar_numerica(self, coluna: str, novos: np.ndarray, alterados: np.ndarray):
+        """Moves only the changed rows inside the sorted index."""
+        indice = self.indices_ordenados[coluna]
+        # Many changes are cheaper to sort again than to move one by one
+        if len(alterados) * 8 > len(indice):
+            self._definir_numerica(coluna, novos)
+            return
+
+        manter = ~np.isin(indice, alterados)
+        indice = indice[manter]
+        valores_ordenados = self.valores_ordenados[coluna][manter]
+        inseridos = alterados[~np.isnan(novos[alterados])]
+        inseridos = inseridos[np.argsort(novos[inseridos], kind='stable')]
+        posicoes = np.searchsorted(valores_ordenados, novos[inseridos], side='right')
+
+        self.numericas[coluna] = novos
+        self.indices_ordenados[coluna] = np.insert(indice, posicoes, inseridos)
+        self.valores_ordenados[coluna] = np.insert(valores_ordenados, posicoes, novos[inseridos])
+
+    def _reindexar_categorica(self, coluna: str, novos: np.ndarray, alterados: np.ndarray):
+        """Flips only the bits of the changed rows."""
+        bitmaps = self.bitmaps[coluna]
+        for valor in bitmaps.values():
+            valor[alterados] = False
+        for linha in alterados:
+            valor = novos[linha]
+            if pd.isna(valor):
+                continue
+            if valor not in bitmaps:
+                bitmaps[valor] = np.zeros(len(self.tickers), dtype=bool)
+            bitmaps[valor][linha] = True
+        self.categoricas[coluna] = novos
+
+    def _faixa_no_indice(self, coluna: str, minimo, maximo) -> np.ndarray:
+        """Row ids with `minimo <= value < maximo`, read straight from the sorted index."""
+        indice = self.indices_ordenados[coluna]
+        valores_ordenados = self.valores_ordenados[coluna]
+        inicio = 0 if minimo is None else np.searchsorted(valores_ordenados, minimo, side='left')
+        fim = len(indice) if maximo is None else np.searchsorted(valores_ordenados, maximo, side='left')
+        return indice[inicio:fim]
+
+    def _bitmap(self, coluna: str, valores) -> np.ndarray:
+        """Union of the bitmaps of the requested values."""
+        if isinstance(valores, str) or not hasattr(valores, '__iter__'):
+            valores = [valores]
+        bitmap = np.zeros(len(self.tickers), dtype=bool)
+        for valor in valores:
+            if valor in self.bitmaps[coluna]:
+                bitmap |= self.bitmaps[coluna][valor]
+        return bitmap
+
+    def _resolver_filtros(self, filtros: dict):
+        """
+        Returns the row ids matching every filter, or None when there are no filters.
+
+        The most selective filter is materialised first and the others are only
+        checked against its candidates.
+        """
+        if not filtros:
+            return None
+
+        resolvidos = []
+        for coluna, condicao in filtros.items():
+            if coluna in self.bitmaps:
+                bitmap = self._bitmap(coluna, condicao)
+                resolvidos.append((int(bitmap.sum()), coluna, bitmap, None))
+            elif coluna in self.indices_ordenados:
+                minimo, maximo = condicao
+                ids = self._faixa_no_indice(coluna, minimo, maximo)
+                resolvidos.append((len(ids), coluna, (minimo, maximo), ids))
+            else:
+                raise KeyError(f"Field '{coluna}' is not indexed by the screener.")
+
+        resolvidos.sort(key=lambda item: item[0])
+        _, coluna, condicao, ids = resolvidos[0]
+        candidatos = np.flatnonzero(condicao) if ids is None else np.sort(ids)
+
+        for _, coluna, condicao, _ in resolvidos[1:]:
+            if len(candidatos) == 0:
+                break
+            if coluna in self.bitmaps:
+                candidatos = candidatos[condicao[candidatos]]
+            else:
+                minimo, maximo = condicao
+                valores = self.numericas[coluna][candidatos]
+                manter = ~np.isnan(valores)
+                if minimo is not None:
+                    manter &= valores >= minimo
+                if maximo is not None:
+                    manter &= valores < maximo
+                candidatos = candidatos[manter]
+
+        return candidatos
+
+    def _top_n(self, coluna: str, candidatos, n, ascendente: bool) -> np.ndarray:
+        """Walks the sorted index from the requested end until N candidates are found."""
+        if coluna not in self.indices_ordenados:
+            raise KeyError(f"Field '{coluna}' is not a numeric field of the screener.")
+
+        indice = self.indices_ordenados[coluna]
+        if not ascendente:
+            indice = indice[::-1]
+        if candidatos is None:
+            return indice[:n] if n is not None else indice
+
+        # A selective filter leaves few candidates: sorting them is cheaper than walking the index.
+        # Candidates come in row order, so the stable sort breaks ties like the index does
+        if len(candidatos) * 8 <= len(indice):
+            valores = self.numericas[coluna][candidatos]
+            ordenados = candidatos[~np.isnan(valores)]
+            ordenados = ordenados[np.argsort(self.numericas[coluna][ordenados], kind='stable')]
+            if not ascendente:
+                ordenados = ordenados[::-1]
+            return ordenados[:n] if n is not None else ordenados
+
+        pertence = np.zeros(len(self.tickers), dtype=bool)
+        pertence[candidatos] = True
+        if n is None:
+            return indice[pertence[indice]]
+
+        # Reads the index in growing blocks, so a selective filter stops early
+        encontrados = []
+        total, inicio, bloco = 0, 0, max(4 * n, 64)
+        while inicio < len(indice) and total < n:
+            parte = indice[inicio:inicio + bloco]
+            parte = parte[pertence[parte]]
+            encontrados.append(parte)
+            total += len(parte)
+            inicio += bloco
+            bloco *= 2
+        if not encontrados:
+            return np.array([], dtype=int)
+        return np.concatenate(encontrados)[:n]
@@ -0,0 +1,255 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from fiiscraper.models.fii import COLUNAS_CATEGORICAS, COLUNAS_TEXTO
+
+# Creates a logger instance. The setup is done in main.py.
+log = logging.getLogger(__name__)
+
+# Thresholds of the quality checks. Any violation may block the upload.
+LIMITES_PADRAO = {
+    # A column is "nulled" above this null ratio, if it was not already before
+    'max_nulos_coluna': 0.5,
+    # Fraction of nulled columns that indicates a layout change on the source
+    'max_fracao_colunas_nulas': 0.2,
+    # Fraction of out-of-range or unparseable values tolerated per column
+    'max_fracao_invalidos': 0.05,
+    # Relative day-over-day change considered a jump
+    'max_salto': 0.5,
+    # Fraction of tickers jumping in the same column tolerated
+    'max_fracao_saltos': 0.1,
+    # Relative change of the row count against the previous partition
+    'max_delta_linhas': 0.2,
+    # Fraction of tickers that came back invalid (None) from the scraper
+    'max_fracao_tickers_invalidos': 0.2,
+}
+
+# Valid ranges (inclusive) of the numeric fields; None leaves a side open
+FAIXAS_VALIDAS = {
+    'cotacao': (0, None),
+    'min_52_semanas': (0, None),
+    'max_52_semanas': (0, None),
+    'volume_medio_2meses': (0, None),
+    'valor_mercado': (0, None),
+    'numero_cotas': (0, None),
+    'p_vp': (0, 20),
+    'vp_cota': (0, None),
+    'div_yield': (-1, 1),
+    'ffo_yield': (-1, 1),
+    'cap_rate': (-1, 1),
+    'vacancia_media': (0, 1),
+    'qtd_imoveis': (0, None),
+    'qtd_unidades': (0, None),
+}
+
+# Fields compared with the previous partition to detect jumps
+COLUNAS_SALTO = ['cotacao', 'p_vp', 'vp_cota', 'patrimonio_liquido', 'numero_cotas']
+
+# Name of the report written next to each partition
+NOME_RELATORIO = 'quality_report.json'
+
+# How many previous partitions are tried when looking for the baseline
+MAX_PARTICOES_ANTERIORES = 7
+
+
+def validar_indicadores(df: pd.DataFrame, df_anterior: pd.DataFrame = None,
+                        tickers_invalidos: int = 0, limites: dict = None) -> dict:
+    """
+    Runs every quality check over the whole batch at once.
+
+    Each partition is parsed once into a numeric matrix, and the checks are
+    column-wise NumPy operations over it, aligned by ticker where needed.
+
+    Args:
+        df (pd.DataFrame): The day's indicators, one row per FII.
+        df_anterior (pd.DataFrame): The previous partition, used for the null
+            ratio baseline, the jumps and the row count delta. Optional; the
+            checks that need it are skipped without it.
+        tickers_invalidos (int): How many tickers the scraper returned as None.
+        limites (dict): Overrides for LIMITES_PADRAO.
+
+    Returns:
+        dict: A compact, JSON-serializable report. 'violacoes' lists the failed
+              checks and 'bloquear' is True when there is any.
+    """
+    limites = {**LIMITES_PADRAO, **(limites or {})}
+    colunas = _colunas_numericas(df)
+    matriz, nao_convertidos = _matriz_numerica(df, colunas)
+    n_linhas = len(df)
+    violacoes = []
+
+    # The previous partition is parsed once and reused by every check that compares with it
+    tem_anterior = df_anterior is not None and len(df_anterior) > 0
+    if tem_anterior:
+        matriz_anterior, _ = _matriz_numerica(df_anterior, colunas)
+
+    # --- Null ratios ---
+    nulos = np.isnan(matriz).mean(axis=0) if n_linhas else np.zeros(len(colunas))
+    if tem_anterior:
+        nulos_anteriores = np.isnan(matriz_anterior).mean(axis=0)
+        # Columns missing in the previous partition have no baseline
+        nulos_anteriores[[c not in df_anterior.columns for c in colunas]] = 0.0
+        anuladas = (nulos > limites['max_nulos_coluna']) & (nulos_anteriores <= limites['max_nulos_coluna'])
+    else:
+        # Without a baseline, naturally sparse columns (e.g., real estate fields of
+        # paper funds) cannot be told apart from a layout change
+        anuladas = np.zeros(len(colunas), dtype=bool)
+    if len(colunas) and anuladas.mean() > limites['max_fracao_colunas_nulas']:
+        violacoes.append(
+            f"{int(anuladas.sum())} of {len(colunas)} columns became mostly null (possible layout change)."
+        )
+
+    # --- Unparseable values (text left in numeric fields) ---
+    fracao_nao_convertidos = nao_convertidos / n_linhas if n_linhas else np.zeros(len(colunas))
+    for coluna in np.array(colunas)[fracao_nao_convertidos > limites['max_fracao_invalidos']]:
+        violacoes.append(f"Column '{coluna}' has unparseable values.")
+
+    # --- Range bounds ---
+    fora_dos_limites = {}
+    for coluna, (minimo, maximo) in FAIXAS_VALIDAS.items():
+        if coluna not in colunas:
+            continue
+        valores = matriz[:, colunas.index(coluna)]
+        fora = np.zeros(n_linhas, dtype=bool)
+        if minimo is not None:
+            fora |= valores < minimo
+        if maximo is not None:
+            fora |= valores > maximo
+        fora_dos_limites[coluna] = int(fora.sum())
+        if n_linhas and fora.mean() > limites['max_fracao_invalidos']:
+            violacoes.append(f"Column '{coluna}' has {int(fora.sum())} values out of [{minimo}, {maximo}].")
+
+    # --- Day-over-day jumps ---
+    saltos = {}
+    if tem_anterior:
+        colunas_salto = [c for c in COLUNAS_SALTO if c in colunas]
+        posicoes = [colunas.index(c) for c in colunas_salto]
+        linhas_atuais, linhas_anteriores = _alinhar_por_ticker(df, df_anterior)
+        atual = matriz[np.ix_(linhas_atuais, posicoes)]
+        anterior = matriz_anterior[np.ix_(linhas_anteriores, posicoes)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variacao = np.abs(atual - anterior) / np.abs(anterior)
+        pulou = variacao > limites['max_salto']
+        comparaveis = np.isfinite(variacao).sum(axis=0)
+        for i, coluna in enumerate(colunas_salto):
+            saltos[coluna] = int(pulou[:, i].sum())
+            if comparaveis[i] and pulou[:, i].sum() / comparaveis[i] > limites['max_fracao_saltos']:
+                violacoes.append(f"Column '{coluna}' jumped more than {limites['max_salto']:.0%} for {saltos[coluna]} FIIs.")
+
+    # --- Row count ---
+    n_anterior = len(df_anterior) if df_anterior is not None else None
+    delta_linhas = (n_linhas - n_anterior) / n_anterior if n_anterior else None
+    if delta_linhas is not None and abs(delta_linhas) > limites['max_delta_linhas']:
+        violacoes.append(f"Row count changed {delta_linhas:+.0%} against the previous partition.")
+
+    # --- Invalid tickers ---
+    total_tickers = n_linhas + tickers_invalidos
+    if total_tickers and tickers_invalidos / total_tickers > limites['max_fracao_tickers_invalidos']:
+        violacoes.append(f"{tickers_invalidos} of {total_tickers} tickers came back invalid.")
+
+    return {
+        'linhas': n_linhas,
+        'linhas_anterior': n_anterior,
+        'delta_linhas': None if delta_linhas is None else round(delta_linhas, 4),
+        'tickers_invalidos': tickers_invalidos,
+        # Only the problematic columns are listed, to keep the report small
+        'nulos': {c: round(float(r), 4) for c, r in zip(colunas, nulos) if r > 0},
+        'colunas_anuladas': [c for c, a in zip(colunas, anuladas) if a],
+        'nao_convertidos': {c: int(q) for c, q in zip(colunas, nao_convertidos) if q},
+        'fora_dos_limites': {c: q for c, q in fora_dos_limites.items() if q},
+        'saltos': {c: q for c, q in saltos.items() if q},
+        'violacoes': violacoes,
+        'bloquear': bool(violacoes),
+    }
+
+
+def validar_e_registrar(df: pd.DataFrame, bucket_name: str, data_ingestao: str,
+                        tickers_invalidos: int = 0) -> dict:
+    """
+    Validates the day's indicators against the newest previous partition with
+    data in S3 and writes the report next to the day's partition.
+
+    Args:
+        df (pd.DataFrame): The day's indicators, before the string conversion.
+        bucket_name (str): The data lake bucket.
+        data_ingestao (str): Partition date in ISO format (e.g., '2025-01-31').
+        tickers_invalidos (int): How many tickers the scraper returned as None.
+
+    Returns:
+        dict: The quality report (see `validar_indicadores`).
+    """
+    # Imported here so the checks can be used without boto3 installed
+    from fiiscraper.aws_uploader import list_s3_prefixes, read_parquet_from_s3, upload_json_to_s3
+
+    prefixo = 'raw/daily_indicators/'
+    particao = f'ingest_date={data_ingestao}'
+    # ISO dates in the partition names sort chronologically
+    anteriores = sorted(p for p in list_s3_prefixes(bucket_name, prefixo) if p < particao)
+
+    # A blocked day leaves a partition holding only its report, so the baseline is
+    # the newest partition that has data. Otherwise a persistent break would be
+    # blocked once and uploaded the next day
+    df_anterior, particao_anterior = None, None
+    for candidata in reversed(anteriores[-MAX_PARTICOES_ANTERIORES:]):
+        try:
+            df_anterior = read_parquet_from_s3(bucket_name, f'{prefixo}{candidata}/data_parquet')
+        except Exception as e:
+            log.warning(f"  > Could not read the previous partition '{candidata}': {e}")
+            continue
+        if df_anterior is not None:
+            particao_anterior = candidata
+            break
+    if anteriores and df_anterior is None:
+        # The checks that need a baseline are skipped, the others still run
+        log.warning("  > No previous partition with data found, skipping the comparison checks.")
+
+    relatorio = validar_indicadores(df, df_anterior, tickers_invalidos=tickers_invalidos)
+    relatorio['particao_anterior'] = particao_anterior
+
+    for violacao in relatorio['violacoes']:
+        log.warning(f"  > Data quality: {violacao}")
+    upload_json_to_s3(relatorio, bucket_name, f'{prefixo}{particao}/{NOME_RELATORIO}')
+    return relatorio
+
+
+# --- PRIVATE FUNCTIONS ---
+
+def _colunas_numericas(df: pd.DataFrame) -> list[str]:
+    return [c for c in df.columns if c not in COLUNAS_CATEGORICAS and c not in COLUNAS_TEXTO]
+
+
+def _matriz_numerica(df: pd.DataFrame, colunas: list[str]):
+    """
+    Builds a float matrix (rows x columns) and counts, per column, the values
+    that were present but could not be parsed as numbers.
+
+    Every cell is parsed in a single `to_numeric` call over the flattened block,
+    instead of one call per column.
+    """
+    bloco = df.reindex(columns=colunas)
+    try:
+        # Typed frames (floats and None) convert directly, with nothing left unparsed
+        return bloco.to_numpy(dtype=float, na_value=np.nan), np.zeros(len(colunas), dtype=int)
+    except (TypeError, ValueError):
+        pass
+
+    brutos = pd.Series(bloco.to_numpy(dtype=object).ravel())
+    # Raw partitions are stored as strings, so 'None'/'nan' are nulls too. They are
+    # masked first, as every value to_numeric fails to parse is slow to coerce
+    presentes = brutos.notna() & ~brutos.isin(['None', 'nan'])
+    convertidos = pd.to_numeric(brutos.where(presentes), errors='coerce')
+
+    formato = (len(bloco), len(colunas))
+    matriz = convertidos.to_numpy(dtype=float).reshape(formato)
+    nao_convertidos = (presentes & convertidos.isna()).to_numpy().reshape(formato).sum(axis=0)
+    return matriz, nao_convertidos
+
+
+def _alinhar_por_ticker(df: pd.DataFrame, df_anterior: pd.DataFrame):
+    """Row positions, in each partition, of the tickers present in both (first occurrence in the previous one)."""
+    unicas = np.flatnonzero(~df_anterior['ticker'].duplicated().to_numpy())
+    posicoes = pd.Index(df_anterior['ticker'].to_numpy()[unicas]).get_indexer(df['ticker'])
+    comuns = posicoes >= 0
+    return np.flatnonzero(comuns), unicas[posicoes[comuns]]
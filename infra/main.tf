@@ -59,11 +59,19 @@ data "aws_iam_policy_document" "lambda_policy_doc" {
     resources = ["arn:aws:logs:*:*:*"]
   }
 
-  # Permission 2: Write (PutObject) to the S3 bucket we created
+  # Permission 2: Read and write objects in the S3 bucket we created
+  # (GetObject loads the curated state and upload manifests, DeleteObject
+  # removes the temporary keys used before committing an upload)
   statement {
-    actions   = ["s3:PutObject"]
+    actions   = ["s3:PutObject", "s3:GetObject", "s3:DeleteObject"]
     resources = ["${aws_s3_bucket.fii_data_lake.arn}/*"] # Points to the bucket above
   }
+
+  # Permission 3: List the bucket, so a missing object returns 404 instead of 403
+  statement {
+    actions   = ["s3:ListBucket"]
+    resources = [aws_s3_bucket.fii_data_lake.arn]
+  }
 }
 
 # 5. IAM Role Policy Attachment
@@ -108,6 +116,12 @@ resource "aws_lambda_function" "fii_scraper_lambda" {
   environment {
     variables = {
       BUCKET_S3 = aws_s3_bucket.fii_data_lake.bucket
+      # Fetches per intraday invocation (see fiiscraper/scheduler.py). The default
+      # tiers need ~88 per hour (50 hourly + 150 every 4 hours); a lower budget
+      # makes the top tiers fall behind their intervals
+      ORCAMENTO_INTRADIARIO = "90"
+      # Set to "true" to skip the indicators upload when quality checks fail
+      VALIDACAO_BLOQUEANTE = "false"
     }
   }
 
@@ -154,6 +168,32 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   source_arn    = aws_cloudwatch_event_rule.daily_schedule.arn
 }
 
+# 10. Intraday Scheduler
+# Triggers hourly during B3 trading hours (10 AM to 4 PM in Brazil, weekdays).
+# Each run only refreshes the most overdue FIIs, ranked by liquidity.
+# Stops at 19:00 UTC: the 20:00 UTC slot belongs to the daily run, and two
+# invocations at once would hit Fundamentus together and race on the scheduler state.
+resource "aws_cloudwatch_event_rule" "intraday_schedule" {
+  name                = "fii_scraper_intraday_trigger"
+  schedule_expression = "cron(0 13-19 ? * MON-FRI *)"
+  description         = "Triggers the liquidity-priority intraday FII refresh"
+}
+
+resource "aws_cloudwatch_event_target" "lambda_intraday_target" {
+  rule      = aws_cloudwatch_event_rule.intraday_schedule.name
+  target_id = "fii_scraper_lambda_intraday"
+  arn       = aws_lambda_function.fii_scraper_lambda.arn
+  input     = jsonencode({ modo = "intradiario" })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_intraday" {
+  statement_id  = "AllowExecutionFromEventBridgeIntraday"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.fii_scraper_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.intraday_schedule.arn
+}
+
 # --- Outputs ---
 # Makes Terraform print the bucket name at the end of the execution
 output "s3_bucket_name_output" {
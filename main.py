@@ -1,6 +1,9 @@
 import fiiscraper as fscp
 import pandas as pd
-from fiiscraper.aws_uploader import upload_df_to_s3
+from fiiscraper.aws_uploader import upload_df_to_s3, get_upload_stats
+from fiiscraper.analytics import atualizar_camada_curated
+from fiiscraper.validation import validar_e_registrar
+from fiiscraper.profiling import MemoryProfiler, montar_df_em_blocos, TAMANHO_BLOCO
 import logging
 from fiiscraper.logger_config import setup_logging
 from fiiscraper import Scraper
@@ -23,84 +26,152 @@ def run_pipeline():
     
     logging.info("--- STARTING FII DATA PIPELINE ---")
     
-    # Creating the Scraper (Data scraping methods)
-    scraper = fscp.Scraper()
-
-    # Listing of FIIs available on the Fundamentus website
-    lista_fiis = scraper.listar_todos_fiis()
-    if not lista_fiis:
-        logging.critical("Could not get the list of FIIs. Shutting down pipeline.")
-        return
-
-    # --- FETCHING DATA ---
-    logging.info("--- STARTING TO FETCH DATA FOR IDENTIFIED FIIs ---")
-    # Fetches the day's indicator data
-    indicadores_fiis = []
-    for fii in lista_fiis:
-
-        # Fetches FII indicators
-        indicadores_fii = scraper.buscar_indicadores_dia(fii.ticker)
+    # Opt-in memory profiling per stage (PERFIL_MEMORIA=true) and memory budget guard
+    perfil = MemoryProfiler()
+
+    try:
+        # Creating the Scraper (Data scraping methods)
+        scraper = fscp.Scraper()
+        perfil.marcar('listar_fiis')
+
+        # Listing of FIIs available on the Fundamentus website
+        lista_fiis = scraper.listar_todos_fiis()
+        if not lista_fiis:
+            logging.critical("Could not get the list of FIIs. Shutting down pipeline.")
+            return
+
+        # --- FETCHING DATA ---
+        logging.info("--- STARTING TO FETCH DATA FOR IDENTIFIED FIIs ---")
+        perfil.marcar('buscar_indicadores')
+        # Fetches the day's indicator data
+        indicadores_fiis = []
+        for fii in lista_fiis:
+
+            # Fetches FII indicators
+            indicadores_fii = scraper.buscar_indicadores_dia(fii.ticker)
         
-        # Adds FII to the list
-        indicadores_fiis.append(indicadores_fii)
+            # Adds FII to the list
+            indicadores_fiis.append(indicadores_fii)
 
-    logging.info("--- STARTING TO FETCH FII PRICES ---")
-    # Fetches the price history for each FII in the list
-    preco_fiis = scraper.buscar_precos_em_lote([fii.ticker for fii in lista_fiis])
+        logging.info("--- STARTING TO FETCH FII PRICES ---")
+        perfil.marcar('buscar_precos')
+        # Fetches the latest price for each FII in the list (yfinance, hedged by brapi)
+        preco_fiis = scraper.buscar_precos([fii.ticker for fii in lista_fiis])
 
-    # --- MARKING FIIs THAT ARE IN YFINANCE ---
-    # Changes to 'tem_dados_yfinance = True' if the FII was found in yfinance
-    for fii in lista_fiis:
-        if fii.ticker in preco_fiis['ticker'].tolist():
-            fii.tem_dados_yfinance = True
+        # --- MARKING FIIs THAT ARE IN YFINANCE ---
+        # Changes to 'tem_dados_yfinance = True' if the FII was found in the price sources.
+        # Kept with its original meaning; the source of each price is in the 'fonte' column
+        tickers_com_preco = set(preco_fiis['ticker']) if not preco_fiis.empty else set()
+        for fii in lista_fiis:
+            if fii.ticker in tickers_com_preco:
+                fii.tem_dados_yfinance = True
 
-    # --- UPLOADING DATA TO S3 ---
-    logging.info("--- STARTING DATA UPLOAD TO S3 ---")
+        # --- UPLOADING DATA TO S3 ---
+        logging.info("--- STARTING DATA UPLOAD TO S3 ---")
     
-    # Get today's date to use in the filenames
-    today = date.today()
-    yesterday = date.today() - timedelta(days=1)
-
-    # Daily indicators
-    if indicadores_fiis: 
-        logging.info("Converting and sending daily statistics to S3...")
-        try:
-            # Convert the list of objects to a Pandas DataFrame
-            df_indicadores = pd.DataFrame([vars(fii) for fii in indicadores_fiis])
-            # Force column type to STRING, as some fields may have values that need later treatment
-            df_indicadores = df_indicadores.astype(str)
-
-            # Define a partitioned filename (good practice for data lakes)
-            nome_arquivo_s3 = f'raw/daily_indicators/ingest_date={today.isoformat()}/data_parquet'
+        # Get today's date to use in the filenames
+        today = date.today()
+        yesterday = date.today() - timedelta(days=1)
+
+        # Kept for the curated layer; stays empty if the indicators are not uploaded
+        df_indicadores = pd.DataFrame()
+
+        # Invalid tickers come back as None and are left out of the upload
+        indicadores_validos = [fii for fii in indicadores_fiis if fii is not None]
+        tickers_invalidos = len(indicadores_fiis) - len(indicadores_validos)
+
+        # Daily indicators
+        if indicadores_validos:
+            logging.info("Converting and sending daily statistics to S3...")
+            perfil.marcar('montar_indicadores')
+            try:
+                # Switches to block mode when the projected peak exceeds the memory budget
+                amostra = pd.DataFrame([vars(fii) for fii in indicadores_validos[:TAMANHO_BLOCO]])
+                em_blocos = perfil.usar_modo_em_blocos(amostra, len(indicadores_validos))
+
+                # Convert the list of objects to a Pandas DataFrame
+                if em_blocos:
+                    # Already converted to strings block by block
+                    df_indicadores = montar_df_em_blocos(indicadores_validos)
+                else:
+                    df_indicadores = pd.DataFrame([vars(fii) for fii in indicadores_validos])
+
+                perfil.marcar('validar_indicadores')
+                # Data quality checks run on the typed values, before the string conversion.
+                # The report is always written; blocking is opt-in (VALIDACAO_BLOQUEANTE=true)
+                relatorio = validar_e_registrar(df_indicadores, bucket_name, today.isoformat(), tickers_invalidos)
+                if relatorio['bloquear'] and os.environ.get('VALIDACAO_BLOQUEANTE', 'false').lower() == 'true':
+                    raise ValueError(f"data quality checks failed: {relatorio['violacoes']}")
+
+                # Force column type to STRING, as some fields may have values that need later treatment.
+                # The block mode already built the strings, so a second full copy is skipped
+                if not em_blocos:
+                    df_indicadores = df_indicadores.astype(str)
+
+                perfil.marcar('upload_indicadores')
+                # Define a partitioned filename (good practice for data lakes)
+                nome_arquivo_s3 = f'raw/daily_indicators/ingest_date={today.isoformat()}/data_parquet'
             
-            # Chama a função de upload do seu módulo
-            upload_df_to_s3(
-                df=df_indicadores,
-                bucket_name=bucket_name,  # Variable defined at the top of main.py
-                s3_filename=nome_arquivo_s3
-            )
-        except Exception as e:
-            logging.error(f"Failed to process and upload indicators: {e}")
-    else:
-        logging.warning("No daily statistics data was collected.")
-
-    # Price Data
-    if not preco_fiis.empty:
-        logging.info("Sending daily prices to S3...")
-        try:
-            # Define a partitioned filename
-            nome_arquivo_s3 = f'raw/price_history_snapshots/price_date={yesterday.isoformat()}/data_parquet'
-
-            # Call the upload function
-            upload_df_to_s3(
-                df=preco_fiis,
-                bucket_name=bucket_name,
-                s3_filename=nome_arquivo_s3
-            )
-        except Exception as e:
-            logging.error(f"Failed to upload prices: {e}")
-    else:
-        logging.warning("No price data was collected.")
+                # Chama a função de upload do seu módulo
+                upload_df_to_s3(
+                    df=df_indicadores,
+                    bucket_name=bucket_name,  # Variable defined at the top of main.py
+                    s3_filename=nome_arquivo_s3,
+                    chunk_rows=TAMANHO_BLOCO if em_blocos else None
+                )
+            except Exception as e:
+                logging.error(f"Failed to process and upload indicators: {e}")
+                # Nothing was uploaded, so the curated layer must not use it either
+                df_indicadores = pd.DataFrame()
+        else:
+            logging.warning("No daily statistics data was collected.")
+
+        # Price Data
+        if not preco_fiis.empty:
+            logging.info("Sending daily prices to S3...")
+            perfil.marcar('upload_precos')
+            try:
+                # Define a partitioned filename
+                nome_arquivo_s3 = f'raw/price_history_snapshots/price_date={yesterday.isoformat()}/data_parquet'
+
+                # Call the upload function. The manifest skips snapshots identical to
+                # the previous one (weekends and holidays)
+                upload_df_to_s3(
+                    df=preco_fiis,
+                    bucket_name=bucket_name,
+                    s3_filename=nome_arquivo_s3,
+                    manifest_key='raw/price_history_snapshots/_manifest.json'
+                )
+            except Exception as e:
+                logging.error(f"Failed to upload prices: {e}")
+        else:
+            logging.warning("No price data was collected.")
+
+        # --- CURATED LAYER ---
+        # Runs whenever there are prices: without the day's indicators (failed or blocked
+        # upload) only the indicator-based metrics are null, and the row-based windows stay aligned
+        if not preco_fiis.empty:
+            logging.info("--- UPDATING CURATED ROLLING METRICS ---")
+            perfil.marcar('camada_curated')
+            try:
+                atualizar_camada_curated(
+                    df_indicadores=df_indicadores,
+                    df_precos=preco_fiis,
+                    bucket_name=bucket_name,
+                    data_ingestao=today.isoformat()
+                )
+            except Exception as e:
+                logging.error(f"Failed to update the curated rolling metrics: {e}")
+    finally:
+        # Also on failure: stops the sampling thread and tracemalloc, and keeps the measurements
+        perfil.registrar_resumo()
+
+    # --- RUN SUMMARY ---
+    stats = get_upload_stats()
+    logging.info(
+        f"Upload summary: {stats['puts']} PUTs ({stats['bytes_uploaded']} bytes), "
+        f"{stats['puts_skipped']} skipped ({stats['bytes_skipped']} bytes saved)."
+    )
 
 # Ensures the pipeline only runs when the script is called directly
 if __name__ == "__main__":
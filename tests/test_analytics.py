@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+from botocore.exceptions import ClientError
+
+from fiiscraper import aws_uploader
+from fiiscraper.analytics import RollingAnalytics, atualizar_camada_curated, preparar_entrada
+
+
+def _historico_sintetico(dias=300, tickers=("MXRF11", "HGLG11", "KNRI11", "VISC11")):
+    """Builds a deterministic price/indicator history for a few tickers."""
+    rng = np.random.default_rng(42)
+    datas = pd.bdate_range("2024-01-01", periods=dias)
+    segmentos = {"MXRF11": "Híbrido", "HGLG11": "Logística", "KNRI11": "Logística", "VISC11": "Shoppings"}
+    linhas = []
+    for ticker in tickers:
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.01, dias))
+        volume = rng.uniform(1e5, 1e6, dias)
+        p_vp = rng.uniform(0.7, 1.2, dias)
+        for i, data in enumerate(datas):
+            linhas.append({
+                "ticker": ticker, "date": data.strftime("%Y-%m-%d"), "close": close[i],
+                "volume": volume[i], "div_cota": 1.1, "p_vp": p_vp[i], "segmento": segmentos[ticker],
+            })
+    return pd.DataFrame(linhas)
+
+
+def test_processamento_incremental_igual_ao_recalculo_completo():
+    """Feeding one day at a time must produce exactly the full recompute output."""
+    historico = _historico_sintetico()
+    completo = RollingAnalytics().recalcular_completo(historico)
+
+    analytics = RollingAnalytics()
+    partes = [analytics.processar(dia) for _, dia in historico.groupby("date", sort=True)]
+    incremental = pd.concat(partes, ignore_index=True)
+
+    pdt.assert_frame_equal(incremental, completo, check_exact=True)
+
+
+def test_estado_limitado_a_janela_mais_longa():
+    """The state must keep only the rows needed by the next run."""
+    analytics = RollingAnalytics()
+    analytics.processar(_historico_sintetico(dias=300, tickers=("MXRF11",)))
+    assert len(analytics.estado) == analytics.tamanho_estado
+
+
+def test_reprocessar_o_mesmo_dia_nao_gera_linhas():
+    """Re-running a day that is already in the state is a no-op."""
+    historico = _historico_sintetico(dias=5)
+    analytics = RollingAnalytics()
+    analytics.processar(historico)
+    resultado = analytics.processar(historico[historico["date"] == historico["date"].max()])
+    assert resultado.empty
+
+
+def test_metricas_conhecidas():
+    """Checks drawdown, dividend yield and segment z-score on hand-computable values."""
+    dados = pd.DataFrame({
+        "ticker": ["AAAA11", "AAAA11", "BBBB11", "BBBB11"],
+        "date": ["2024-01-01", "2024-01-02", "2024-01-01", "2024-01-02"],
+        "close": [10.0, 8.0, 20.0, 20.0],
+        "volume": [1.0, 1.0, 1.0, 1.0],
+        "div_cota": [1.0, 1.0, 2.0, 2.0],
+        "p_vp": [0.9, 0.8, 1.0, 1.2],
+        "segmento": ["Logística"] * 4,
+    })
+    resultado = RollingAnalytics().processar(dados).set_index(["ticker", "date"])
+    linha = resultado.loc[("AAAA11", pd.Timestamp("2024-01-02"))]
+    assert np.isclose(linha["drawdown_52_semanas"], -0.2)
+    assert np.isclose(linha["dy_12_meses"], 0.125)
+    assert np.isclose(linha["p_vp_zscore_segmento"], -1 / np.sqrt(2))
+    assert np.isnan(linha["volume_medio_20d"])
+
+
+def test_preparar_entrada_converte_particoes_raw():
+    """Raw partitions are strings; the join must still produce numeric metrics."""
+    df_indicadores = pd.DataFrame({
+        "ticker": ["MXRF11"], "segmento": ["Híbrido"], "div_cota": ["1.2"], "p_vp": ["None"], "nome": ["x"],
+    })
+    df_precos = pd.DataFrame({"ticker": ["MXRF11"], "date": ["2024-01-02"], "close": [10.0], "volume": [5.0]})
+    resultado = RollingAnalytics().processar(preparar_entrada(df_indicadores, df_precos))
+    assert np.isclose(resultado["dy_12_meses"].iloc[0], 0.12)
+    assert np.isnan(resultado["p_vp"].iloc[0])
+
+
+def test_falha_ao_ler_estado_aborta_a_camada_curated(monkeypatch):
+    """A read error must not be mistaken for a first run, which would truncate every window."""
+    def _ler_com_falha(*args, **kwargs):
+        raise ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+
+    enviados = []
+    monkeypatch.setattr(aws_uploader, "read_parquet_from_s3", _ler_com_falha)
+    monkeypatch.setattr(aws_uploader, "upload_df_to_s3", lambda **kwargs: enviados.append(kwargs) or True)
+
+    dados = _historico_sintetico(dias=2)
+    df_indicadores = dados.drop_duplicates("ticker")[["ticker", "segmento", "div_cota", "p_vp"]]
+    df_precos = dados[dados["date"] == dados["date"].max()][["ticker", "date", "close", "volume"]]
+
+    assert not atualizar_camada_curated(df_indicadores, df_precos, "bucket", "2024-01-02")
+    assert enviados == []
+
+
+def test_dia_sem_indicadores_mantem_as_janelas_alinhadas():
+    """A day without indicators still enters the state, so later windows match a full recompute."""
+    historico = _historico_sintetico(dias=80)
+    completo = RollingAnalytics().recalcular_completo(historico)
+    datas = sorted(historico["date"].unique())
+
+    analytics = RollingAnalytics()
+    for data in datas:
+        dia = historico[historico["date"] == data]
+        precos = dia[["ticker", "date", "close", "volume"]]
+        indicadores = dia[["ticker", "segmento", "div_cota", "p_vp"]]
+        # The indicators upload failed on one day
+        if data == datas[40]:
+            indicadores = pd.DataFrame()
+        resultado = analytics.processar(preparar_entrada(indicadores, precos))
+
+    ultimo = completo[completo["date"] == pd.Timestamp(datas[-1])].set_index("ticker").sort_index()
+    resultado = resultado.set_index("ticker").sort_index()
+    for coluna in ["volume_medio_60d", "drawdown_52_semanas", "tendencia_volume"]:
+        np.testing.assert_array_equal(resultado[coluna], ultimo[coluna])
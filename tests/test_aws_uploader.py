@@ -0,0 +1,141 @@
+import io
+import json
+
+import boto3
+import pandas as pd
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from fiiscraper import aws_uploader
+from fiiscraper.aws_uploader import (
+    compute_content_hash,
+    get_upload_stats,
+    read_parquet_from_s3,
+    reset_upload_stats,
+    upload_df_to_s3,
+)
+
+BUCKET = "fii-data-bucket-test"
+CHAVE = "raw/price_history_snapshots/price_date=2025-01-31/data_parquet"
+MANIFESTO = "raw/price_history_snapshots/_manifest.json"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """Creates an in-memory S3 bucket with fake credentials."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        cliente = boto3.client("s3")
+        cliente.create_bucket(Bucket=BUCKET)
+        reset_upload_stats()
+        yield cliente
+
+
+def _precos():
+    return pd.DataFrame({"ticker": ["MXRF11", "HGLG11"], "date": ["2025-01-31"] * 2, "close": [10.5, 160.2]})
+
+
+def _chaves(cliente):
+    return sorted(obj["Key"] for obj in cliente.list_objects_v2(Bucket=BUCKET).get("Contents", []))
+
+
+def test_hash_independe_da_ordem_das_linhas_e_colunas():
+    df = _precos()
+    embaralhado = df.iloc[::-1][["close", "ticker", "date"]]
+    assert compute_content_hash(df) == compute_content_hash(embaralhado)
+    assert compute_content_hash(df) != compute_content_hash(df.assign(close=[10.6, 160.2]))
+
+
+def test_upload_grava_objeto_e_metadata(s3):
+    assert upload_df_to_s3(_precos(), BUCKET, CHAVE)
+
+    # No temporary key is left behind after the commit step
+    assert _chaves(s3) == [CHAVE]
+    cabecalho = s3.head_object(Bucket=BUCKET, Key=CHAVE)
+    assert cabecalho["Metadata"]["content-sha256"] == compute_content_hash(_precos())
+    lido = pd.read_parquet(io.BytesIO(s3.get_object(Bucket=BUCKET, Key=CHAVE)["Body"].read()))
+    pd.testing.assert_frame_equal(lido, _precos())
+    assert get_upload_stats()["puts"] == 1
+
+
+def test_reupload_identico_na_mesma_chave_e_evitado(s3, monkeypatch):
+    upload_df_to_s3(_precos(), BUCKET, CHAVE)
+
+    # A skipped upload must not even encode the Parquet
+    def _falhar(*args, **kwargs):
+        raise AssertionError("to_parquet should not be called")
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", _falhar)
+
+    assert upload_df_to_s3(_precos().iloc[::-1], BUCKET, CHAVE)
+    stats = get_upload_stats()
+    assert stats["puts"] == 1
+    assert stats["puts_skipped"] == 1
+    assert stats["bytes_skipped"] == stats["bytes_uploaded"]
+
+
+def test_manifesto_evita_snapshot_repetido_em_outra_particao(s3):
+    outra_chave = CHAVE.replace("2025-01-31", "2025-02-01")
+    upload_df_to_s3(_precos(), BUCKET, CHAVE, manifest_key=MANIFESTO)
+    upload_df_to_s3(_precos(), BUCKET, outra_chave, manifest_key=MANIFESTO)
+
+    assert outra_chave not in _chaves(s3)
+    assert get_upload_stats()["puts_skipped"] == 1
+
+    # The skipped partition records which partition holds its data
+    alias = outra_chave.replace("data_parquet", "_alias.json")
+    marcador = json.loads(s3.get_object(Bucket=BUCKET, Key=alias)["Body"].read())
+    assert marcador["alias_of"] == CHAVE
+
+    # Changed data is uploaded normally, and the stale alias is removed
+    upload_df_to_s3(_precos().assign(close=[10.7, 161.0]), BUCKET, outra_chave, manifest_key=MANIFESTO)
+    assert outra_chave in _chaves(s3)
+    assert alias not in _chaves(s3)
+
+
+def test_manifesto_corrompido_nao_impede_o_upload(s3):
+    """A corrupt manifest is ignored and rewritten by the next upload."""
+    s3.put_object(Bucket=BUCKET, Key=MANIFESTO, Body=b'{"content_hash": "abc", "ke')
+
+    assert upload_df_to_s3(_precos(), BUCKET, CHAVE, manifest_key=MANIFESTO)
+    assert CHAVE in _chaves(s3)
+    manifesto = json.loads(s3.get_object(Bucket=BUCKET, Key=MANIFESTO)["Body"].read())
+    assert manifesto["key"] == CHAVE
+
+
+def test_falha_no_commit_nao_deixa_objeto_final_nem_temporario(s3, monkeypatch):
+    cliente_real = boto3.client
+
+    def _cliente_com_falha(*args, **kwargs):
+        cliente = cliente_real(*args, **kwargs)
+
+        def _copy_object(**kwargs):
+            raise RuntimeError("simulated failure before commit")
+        cliente.copy_object = _copy_object
+        return cliente
+
+    monkeypatch.setattr(aws_uploader.boto3, "client", _cliente_com_falha)
+
+    assert not upload_df_to_s3(_precos(), BUCKET, CHAVE)
+    assert _chaves(s3) == []
+
+
+def test_upload_em_blocos_gera_o_mesmo_parquet_logico(s3):
+    df = pd.DataFrame({"ticker": [f"F{i:04d}11" for i in range(1000)], "cotacao": [str(i) for i in range(1000)]})
+    assert upload_df_to_s3(df, BUCKET, CHAVE, chunk_rows=100)
+
+    lido = pd.read_parquet(io.BytesIO(s3.get_object(Bucket=BUCKET, Key=CHAVE)["Body"].read()))
+    pd.testing.assert_frame_equal(lido, df)
+
+
+def test_leitura_distingue_objeto_ausente_de_falha(s3):
+    assert read_parquet_from_s3(BUCKET, CHAVE) is None
+
+    upload_df_to_s3(_precos(), BUCKET, CHAVE)
+    pd.testing.assert_frame_equal(read_parquet_from_s3(BUCKET, CHAVE), _precos())
+
+    # Any other error is raised instead of looking like a missing object
+    with pytest.raises(ClientError):
+        read_parquet_from_s3("bucket-que-nao-existe", CHAVE)
@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pandas as pd
+import pytest
+from fiiscraper.price_sources import BrapiSource, HedgedPriceFetcher, PriceSource
+
+# Quotes served by the local stand-in for the brapi API
+COTACOES_BRAPI = {
+    "MXRF11": 10.5,
+    "HGLG11": 160.2,
+    "KNRI11": 140.0,
+    "VISC11": 110.3,
+}
+
+
+class _BrapiHandler(BaseHTTPRequestHandler):
+    """Answers /api/quote/<T1,T2,...> like brapi, and records every request."""
+
+    def do_GET(self):
+        caminho = urlparse(self.path).path
+        self.server.requisicoes.append(caminho)
+        if self.server.falhar:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        tickers = caminho.rsplit("/", 1)[-1].split(",")
+        resultados = [
+            {
+                "symbol": ticker,
+                "regularMarketPrice": COTACOES_BRAPI[ticker],
+                "regularMarketTime": "2025-01-31T20:07:00.000Z",
+                "regularMarketVolume": 1000,
+            }
+            for ticker in tickers if ticker in COTACOES_BRAPI
+        ]
+        corpo = json.dumps({"results": resultados}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor_brapi():
+    """Starts the brapi stand-in on a free local port."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _BrapiHandler)
+    servidor.requisicoes = []
+    servidor.falhar = False
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    servidor.url_base = f"http://127.0.0.1:{servidor.server_address[1]}/api/quote/"
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class _FonteFixa(PriceSource):
+    """Local price source answering a fixed set of tickers after a delay."""
+
+    def __init__(self, nome, precos, atraso=0.0):
+        self.nome = nome
+        self.precos = precos
+        self.atraso = atraso
+        self.chamadas = []
+
+    def buscar_precos(self, tickers):
+        self.chamadas.append(list(tickers))
+        time.sleep(self.atraso)
+        linhas = [{"ticker": t, "date": "2025-01-31", "close": self.precos[t], "volume": 1.0}
+                  for t in tickers if t in self.precos]
+        return pd.DataFrame(linhas)
+
+
+def test_brapi_agrupa_tickers_em_lotes(servidor_brapi):
+    """Tickers are split into batches, one request per batch."""
+    fonte = BrapiSource(servidor_brapi.url_base, tamanho_lote=2)
+    resultado = fonte.buscar_precos(["MXRF11", "HGLG11", "KNRI11", "XXXX11"])
+
+    assert len(servidor_brapi.requisicoes) == 2
+    assert sorted(resultado["ticker"]) == ["HGLG11", "KNRI11", "MXRF11"]
+    assert resultado.set_index("ticker").loc["MXRF11", "close"] == 10.5
+    assert resultado["date"].unique().tolist() == ["2025-01-31"]
+
+
+def test_brapi_retorna_vazio_em_erro_http(servidor_brapi):
+    servidor_brapi.falhar = True
+    resultado = BrapiSource(servidor_brapi.url_base).buscar_precos(["MXRF11"])
+    assert isinstance(resultado, pd.DataFrame)
+    assert resultado.empty
+
+
+def test_primaria_rapida_nao_dispara_hedge(servidor_brapi):
+    """When the primary answers within the threshold, brapi is never called."""
+    primaria = _FonteFixa("yfinance", {"MXRF11": 10.4, "HGLG11": 160.0})
+    fetcher = HedgedPriceFetcher(primaria, BrapiSource(servidor_brapi.url_base), limiar_latencia=1.0)
+
+    resultado = fetcher.buscar_precos(["MXRF11", "HGLG11"])
+
+    assert servidor_brapi.requisicoes == []
+    assert set(resultado["fonte"]) == {"yfinance"}
+
+
+def test_primaria_lenta_perde_para_brapi(servidor_brapi):
+    """A slow primary is raced against brapi, which wins."""
+    primaria = _FonteFixa("yfinance", {"MXRF11": 10.4}, atraso=2.0)
+    fetcher = HedgedPriceFetcher(primaria, BrapiSource(servidor_brapi.url_base),
+                                 limiar_latencia=0.1, timeout_complemento=0.1)
+
+    inicio = time.perf_counter()
+    resultado = fetcher.buscar_precos(["MXRF11", "HGLG11"])
+
+    assert time.perf_counter() - inicio < 1.5
+    assert set(resultado["fonte"]) == {"brapi"}
+    assert sorted(resultado["ticker"]) == ["HGLG11", "MXRF11"]
+
+
+def test_tickers_faltantes_vem_da_outra_fonte(servidor_brapi):
+    """Tickers missing from the winner are filled from brapi, with the source recorded."""
+    primaria = _FonteFixa("yfinance", {"MXRF11": 10.4})
+    fetcher = HedgedPriceFetcher(primaria, BrapiSource(servidor_brapi.url_base), limiar_latencia=1.0)
+
+    resultado = fetcher.buscar_precos(["MXRF11", "VISC11", "ZZZZ11"]).set_index("ticker")
+
+    assert resultado.loc["MXRF11", "fonte"] == "yfinance"
+    assert resultado.loc["VISC11", "fonte"] == "brapi"
+    assert "ZZZZ11" not in resultado.index
+    # Only the missing tickers were requested from brapi
+    assert servidor_brapi.requisicoes == ["/api/quote/VISC11,ZZZZ11"]
+
+
+def test_primaria_vazia_cai_para_secundaria(servidor_brapi):
+    primaria = _FonteFixa("yfinance", {})
+    fetcher = HedgedPriceFetcher(primaria, BrapiSource(servidor_brapi.url_base), limiar_latencia=1.0)
+    resultado = fetcher.buscar_precos(["KNRI11"])
+    assert resultado["fonte"].tolist() == ["brapi"]
+
+
+def test_nenhuma_fonte_responde(servidor_brapi):
+    servidor_brapi.falhar = True
+    fetcher = HedgedPriceFetcher(_FonteFixa("yfinance", {}), BrapiSource(servidor_brapi.url_base))
+    assert fetcher.buscar_precos(["MXRF11"]).empty
+
+
+def test_fonte_sem_buscar_precos_falha_na_construcao():
+    """A half-implemented source must fail when created, not inside the hedging thread."""
+    class _FonteIncompleta(PriceSource):
+        nome = "incompleta"
+
+    with pytest.raises(TypeError):
+        _FonteIncompleta()
@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+from fiiscraper.models.fii import FII
+from fiiscraper.profiling import MemoryProfiler, montar_df_em_blocos
+
+
+def _fiis(n):
+    fiis = []
+    for i in range(n):
+        fii = FII(f"F{i:04d}11")
+        fii.cotacao = 10.0 + i
+        fii.segmento = "Logística"
+        fiis.append(fii)
+    return fiis
+
+
+def test_perfil_inativo_nao_registra_nada():
+    perfil = MemoryProfiler(ativo=False)
+    perfil.marcar("etapa")
+    assert perfil.resumo() == []
+
+
+def test_perfil_registra_pico_e_alocacoes_por_etapa():
+    perfil = MemoryProfiler(ativo=True)
+    perfil.marcar("pequena")
+    pequena = [0] * 10
+    perfil.marcar("grande")
+    grande = [bytes(1000) for _ in range(20_000)]  # ~20 MB alive at the end of the stage
+    resumo = perfil.resumo()
+    perfil.registrar_resumo()
+    del pequena, grande
+
+    assert [e["etapa"] for e in resumo] == ["pequena", "grande"]
+    assert resumo[1]["tracemalloc_pico_mb"] > 15
+    assert resumo[1]["tracemalloc_pico_mb"] > resumo[0]["tracemalloc_pico_mb"]
+    assert "test_profiling.py" in resumo[1]["top_alocacoes"][0]["local"]
+
+
+def test_alocacoes_de_etapas_anteriores_nao_aparecem():
+    """Objects kept alive by an earlier stage must not crowd out the current stage's allocations."""
+    perfil = MemoryProfiler(ativo=True)
+    perfil.marcar("anterior")
+    anterior = [bytes(1000) for _ in range(20_000)]
+    perfil.marcar("atual")
+    atual = [str(i) * 10 for i in range(1_000)]
+    resumo = perfil.resumo()
+    perfil.registrar_resumo()
+
+    locais = [a["local"] for a in resumo[1]["top_alocacoes"]]
+    assert all(a["mb"] < 1 for a in resumo[1]["top_alocacoes"])
+    assert any("test_profiling.py" in local for local in locais)
+    del anterior, atual
+
+
+def test_guarda_muda_para_blocos_acima_do_orcamento():
+    amostra = pd.DataFrame([vars(fii) for fii in _fiis(50)])
+    assert not MemoryProfiler(ativo=False, orcamento_mb=None).usar_modo_em_blocos(amostra, 10**6)
+    assert MemoryProfiler(ativo=False, orcamento_mb=1).usar_modo_em_blocos(amostra, 10**6)
+    assert not MemoryProfiler(ativo=False, orcamento_mb=10**6).usar_modo_em_blocos(amostra, 500)
+
+
+def test_orcamento_padrao_da_memoria_do_lambda(monkeypatch):
+    monkeypatch.delenv("MEMORIA_ORCAMENTO_MB", raising=False)
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "512")
+    assert MemoryProfiler(ativo=False).orcamento_mb == pytest.approx(409.6)
+    monkeypatch.setenv("MEMORIA_ORCAMENTO_MB", "300")
+    assert MemoryProfiler(ativo=False).orcamento_mb == 300
+
+
+def test_modo_em_blocos_igual_ao_modo_completo():
+    fiis = _fiis(250)
+    completo = pd.DataFrame([vars(fii) for fii in fiis]).astype(str)
+    pd.testing.assert_frame_equal(montar_df_em_blocos(fiis, tamanho_bloco=100), completo)
+
+
+def test_modo_em_blocos_igual_com_bloco_todo_nulo():
+    """A column null in a whole block must get the dtype (and strings) of the full frame."""
+    fiis = _fiis(250)
+    for i, fii in enumerate(fiis):
+        # Filled in the first block only, null in the others
+        fii.vacancia_media = 0.1 if i < 100 else None
+        # Integers in the first two blocks, a null only in the last one
+        fii.qtd_imoveis = i if i < 200 else None
+    completo = pd.DataFrame([vars(fii) for fii in fiis])
+    em_blocos = montar_df_em_blocos(fiis, tamanho_bloco=100)
+    pd.testing.assert_frame_equal(em_blocos, completo.astype(str))
+    assert em_blocos.loc[0, "qtd_imoveis"] == str(completo.loc[0, "qtd_imoveis"])
@@ -0,0 +1,171 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from fiiscraper import aws_uploader
+from fiiscraper.models.fii import FII
+from fiiscraper.scheduler import RefreshScheduler, executar_atualizacao_intradiaria, registrar_execucao_diaria
+
+HORA = 60 * 60
+DIA = 24 * HORA
+
+# Small tiers so the simulation stays readable: top-2 hourly, the rest daily
+TIERS = [(2, HORA), (None, DIA)]
+
+
+class RelogioFalso:
+    """Fake clock advanced by hand in the simulation."""
+
+    def __init__(self, inicio=0.0):
+        self.agora = inicio
+
+    def __call__(self):
+        return self.agora
+
+    def avancar(self, segundos):
+        self.agora += segundos
+
+
+def _fii(ticker, volume, cotacao=10.0):
+    fii = FII(ticker)
+    fii.volume_medio_2meses = volume
+    fii.cotacao = cotacao
+    return fii
+
+
+@pytest.fixture
+def universo():
+    # AAAA and BBBB are the liquid funds, the others are the long tail
+    return [_fii("AAAA11", 5e6), _fii("BBBB11", 3e6), _fii("CCCC11", 1e5),
+            _fii("DDDD11", 5e4), _fii("EEEE11", 1e4)]
+
+
+def _executar(scheduler, universo, orcamento, cotacoes=None, duracao_busca=2.0):
+    """Simulates one invocation: fetches the batch, each fetch taking some time, and records the results."""
+    por_ticker = {fii.ticker: fii for fii in universo}
+    inicio = scheduler.relogio()
+    lote = scheduler.proximo_lote(orcamento)
+    for ticker in lote:
+        scheduler.relogio.avancar(duracao_busca)
+        fii = por_ticker[ticker]
+        if cotacoes and ticker in cotacoes:
+            fii.cotacao = cotacoes[ticker]
+        scheduler.registrar_atualizacao(ticker, fii, momento=inicio)
+    return lote
+
+
+def test_orcamento_e_respeitado_e_liquidos_primeiro(universo):
+    relogio = RelogioFalso()
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=relogio)
+    scheduler.atualizar_universo(universo)
+
+    assert _executar(scheduler, universo, 2) == ["AAAA11", "BBBB11"]
+    assert _executar(scheduler, universo, 2) == ["CCCC11", "DDDD11"]
+    assert _executar(scheduler, universo, 2) == ["EEEE11"]
+    assert _executar(scheduler, universo, 2) == []
+
+
+def test_simulacao_de_um_dia_respeita_os_tiers(universo):
+    """Over 24 hourly invocations the liquid funds are refreshed hourly, the tail once."""
+    relogio = RelogioFalso()
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=relogio)
+    scheduler.atualizar_universo(universo)
+
+    contagem = {fii.ticker: 0 for fii in universo}
+    for hora in range(24):
+        for ticker in _executar(scheduler, universo, orcamento=4):
+            contagem[ticker] += 1
+        # The trigger fires on the hour, however long the fetches took
+        relogio.agora = (hora + 1) * HORA
+
+    assert contagem["AAAA11"] == 24
+    assert contagem["BBBB11"] == 24
+    assert contagem["CCCC11"] == contagem["DDDD11"] == contagem["EEEE11"] == 1
+
+
+def test_mais_atrasado_tem_prioridade(universo):
+    """With a short budget, the most overdue ticker wins over a more liquid one."""
+    relogio = RelogioFalso()
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=relogio)
+    scheduler.atualizar_universo(universo)
+    _executar(scheduler, universo, orcamento=5)
+
+    # AAAA11 is refreshed again half an hour later, so BBBB11 becomes more overdue
+    relogio.avancar(HORA / 2)
+    scheduler.registrar_atualizacao("AAAA11", universo[0])
+    relogio.avancar(2 * HORA)
+    assert _executar(scheduler, universo, orcamento=1) == ["BBBB11"]
+
+
+def test_mudancas_frequentes_sobem_de_tier(universo):
+    """A tail fund whose data keeps changing is promoted over a stable liquid one."""
+    relogio = RelogioFalso()
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=relogio)
+    scheduler.atualizar_universo(universo)
+    _executar(scheduler, universo, orcamento=5)
+
+    for i in range(20):
+        relogio.avancar(DIA)
+        _executar(scheduler, universo, orcamento=5, cotacoes={"CCCC11": 10.0 + i + 1})
+
+    fila = scheduler.fila()
+    assert fila.loc["CCCC11", "frequencia_mudanca"] > 0.9
+    assert fila.loc["DDDD11", "frequencia_mudanca"] == 0
+
+    # With comparable volumes, the changing fund takes the hourly tier
+    universo[1].volume_medio_2meses = 1.5e5
+    scheduler.atualizar_universo(universo)
+    assert scheduler.fila().loc["CCCC11", "intervalo"] == HORA
+    assert scheduler.fila().loc["BBBB11", "intervalo"] == DIA
+
+
+def test_estado_persistido_e_recarregado(universo):
+    relogio = RelogioFalso()
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=relogio)
+    scheduler.atualizar_universo(universo)
+    _executar(scheduler, universo, orcamento=2)
+
+    estado = scheduler.para_dataframe()
+    recarregado = RefreshScheduler(estado=estado, tiers=TIERS, relogio=relogio)
+    assert recarregado.proximo_lote(5) == scheduler.proximo_lote(5)
+
+
+def test_falha_na_busca_mantem_ticker_vencido(universo):
+    relogio = RelogioFalso()
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=relogio)
+    scheduler.atualizar_universo(universo)
+    scheduler.registrar_atualizacao("AAAA11", None)
+    assert scheduler.proximo_lote(1) == ["AAAA11"]
+
+
+def test_universo_remove_tickers_deslistados(universo):
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=RelogioFalso())
+    scheduler.atualizar_universo(universo)
+    scheduler.atualizar_universo(universo[:3])
+    assert sorted(scheduler.para_dataframe()["ticker"]) == ["AAAA11", "BBBB11", "CCCC11"]
+
+
+def test_falha_ao_ler_estado_nao_reinicia_a_fila(universo, monkeypatch):
+    """A read error must not re-seed the queue and wipe the change frequencies."""
+    def _ler_com_falha(*args, **kwargs):
+        raise ClientError({"Error": {"Code": "SlowDown"}}, "GetObject")
+
+    enviados = []
+    monkeypatch.setattr(aws_uploader, "read_parquet_from_s3", _ler_com_falha)
+    monkeypatch.setattr(aws_uploader, "upload_df_to_s3", lambda **kwargs: enviados.append(kwargs) or True)
+
+    with pytest.raises(ClientError):
+        registrar_execucao_diaria(universo, "bucket")
+    with pytest.raises(ClientError):
+        executar_atualizacao_intradiaria(scraper=None, bucket_name="bucket", orcamento=2)
+    assert enviados == []
+
+
+def test_gatilho_adiantado_ainda_encontra_o_tier_horario_vencido(universo):
+    """A trigger firing a few seconds early must not skip the hourly tier for a whole hour."""
+    relogio = RelogioFalso()
+    scheduler = RefreshScheduler(tiers=TIERS, relogio=relogio)
+    scheduler.atualizar_universo(universo)
+    _executar(scheduler, universo, orcamento=5)
+
+    relogio.agora = HORA - 5
+    assert _executar(scheduler, universo, orcamento=2) == ["AAAA11", "BBBB11"]
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fiiscraper.screener import FIIScreener
+
+
+def _snapshot(n=200, seed=0):
+    """Builds a raw-like snapshot (all columns as strings, like the raw layer)."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "ticker": [f"F{i:03d}11" for i in range(n)],
+        "nome": [f"Fundo {i}" for i in range(n)],
+        "segmento": rng.choice(["Logística", "Shoppings", "Híbrido", "Lajes Corporativas"], n),
+        "mandato": rng.choice(["Renda", "Desenvolvimento"], n),
+        "tipo_gestao": rng.choice(["Ativa", "Passiva"], n),
+        "p_vp": rng.uniform(0.6, 1.4, n).round(2),
+        "div_yield": rng.uniform(0.05, 0.15, n).round(4),
+        "vacancia_media": rng.uniform(0, 0.3, n).round(3),
+    })
+    df.loc[::17, "vacancia_media"] = None
+    return df.astype(str)
+
+
+def _referencia(df, p_vp_max, segmento, vacancia_max):
+    """Plain pandas answer used as the oracle."""
+    num = df.replace({"None": None, "nan": None}).assign(
+        p_vp=lambda d: pd.to_numeric(d["p_vp"]),
+        div_yield=lambda d: pd.to_numeric(d["div_yield"]),
+        vacancia_media=lambda d: pd.to_numeric(d["vacancia_media"]),
+    )
+    return num[(num["p_vp"] < p_vp_max) & (num["segmento"] == segmento) & (num["vacancia_media"] < vacancia_max)]
+
+
+def test_consulta_composta_igual_ao_pandas():
+    """Range + equality filters must match a full pandas scan."""
+    df = _snapshot()
+    screener = FIIScreener(df, "ingest_date=2025-01-01")
+    resultado = screener.consultar({"p_vp": (None, 1), "segmento": "Logística", "vacancia_media": (None, 0.1)})
+    esperado = _referencia(df, 1, "Logística", 0.1)
+    assert sorted(resultado["ticker"]) == sorted(esperado["ticker"])
+
+
+def test_top_n_com_filtro():
+    """Top-N by dividend yield inside a segment."""
+    df = _snapshot()
+    screener = FIIScreener(df)
+    resultado = screener.consultar({"segmento": ["Logística", "Shoppings"]}, ordenar_por="div_yield", n=5)
+    esperado = df[df["segmento"].isin(["Logística", "Shoppings"])]["div_yield"].astype(float)
+    assert resultado["div_yield"].tolist() == esperado.sort_values(ascending=False).head(5).tolist()
+
+
+def test_top_n_com_poucos_e_muitos_candidatos_igual_ao_indice():
+    """The candidate sort used for selective filters must rank like the index walk."""
+    df = _snapshot(n=400)
+    screener = FIIScreener(df)
+    numerico = df.replace({"None": None, "nan": None}).astype({"p_vp": float, "vacancia_media": float})
+    for filtros in [{"p_vp": (1.0, 1.02)}, {"segmento": "Logística"}]:
+        for ascendente in (False, True):
+            resultado = screener.consultar(filtros, ordenar_por="vacancia_media", n=7, ascendente=ascendente)
+            mascara = (numerico["p_vp"] >= 1.0) & (numerico["p_vp"] < 1.02) if "p_vp" in filtros \
+                else numerico["segmento"] == "Logística"
+            esperado = numerico[mascara]["vacancia_media"].dropna().sort_values(ascending=ascendente).head(7)
+            assert resultado["vacancia_media"].tolist() == esperado.tolist()
+
+
+def test_filtro_sem_resultado_e_campo_desconhecido():
+    screener = FIIScreener(_snapshot())
+    assert screener.consultar({"segmento": "Inexistente"}).empty
+    with pytest.raises(KeyError):
+        screener.consultar({"campo_inexistente": (0, 1)})
+
+
+def test_atualizacao_incremental_igual_a_recarga():
+    """Refreshing with a new partition must answer like a screener built from it."""
+    antigo = _snapshot(seed=0)
+    novo = antigo.copy()
+    novo.loc[[3, 50, 120], "p_vp"] = ["0.5", "1.3", "None"]
+    novo.loc[[7, 80], "segmento"] = ["Logística", "Agro"]
+
+    incremental = FIIScreener(antigo, "ingest_date=2025-01-01")
+    incremental.atualizar(novo, "ingest_date=2025-01-02")
+    recarregado = FIIScreener(novo, "ingest_date=2025-01-02")
+
+    for filtros in [{"p_vp": (None, 1), "segmento": "Logística"}, {"segmento": "Agro"}, {"p_vp": (0.55, 1.3)}]:
+        a = incremental.consultar(filtros, ordenar_por="p_vp")
+        b = recarregado.consultar(filtros, ordenar_por="p_vp")
+        assert a["p_vp"].tolist() == b["p_vp"].tolist()
+        assert sorted(a["ticker"]) == sorted(b["ticker"])
+    for coluna in recarregado.valores_ordenados:
+        np.testing.assert_array_equal(incremental.valores_ordenados[coluna], recarregado.valores_ordenados[coluna])
+    assert incremental.particao == "ingest_date=2025-01-02"
+
+
+def test_atualizacao_com_novos_tickers_reconstroi():
+    antigo = _snapshot(n=10)
+    novo = _snapshot(n=12)
+    screener = FIIScreener(antigo)
+    screener.atualizar(novo)
+    assert len(screener.tickers) == 12
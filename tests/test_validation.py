@@ -0,0 +1,169 @@
+import json
+
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+
+from fiiscraper.aws_uploader import upload_df_to_s3
+from fiiscraper.models.fii import FII
+from fiiscraper.validation import _colunas_numericas, validar_e_registrar, validar_indicadores
+
+BUCKET = "bucket-teste"
+PREFIXO = "raw/daily_indicators/"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """Creates an in-memory S3 bucket with fake credentials."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        cliente = boto3.client("s3")
+        cliente.create_bucket(Bucket=BUCKET)
+        yield cliente
+
+
+def _lote(n=3000, seed=0):
+    """Builds a plausible batch of daily indicators."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "ticker": [f"F{i:04d}11" for i in range(n)],
+        "nome": [f"Fundo {i}" for i in range(n)],
+        "segmento": rng.choice(["Logística", "Shoppings", "Híbrido"], n),
+        "cotacao": rng.uniform(5, 200, n),
+        "p_vp": rng.uniform(0.5, 1.5, n),
+        "vp_cota": rng.uniform(5, 200, n),
+        "div_yield": rng.uniform(0.05, 0.15, n),
+        "vacancia_media": rng.uniform(0, 0.3, n),
+        "patrimonio_liquido": rng.uniform(1e7, 1e9, n),
+        "numero_cotas": rng.uniform(1e5, 1e7, n),
+    })
+
+
+def test_lote_saudavel_nao_bloqueia():
+    hoje = _lote()
+    ontem = _lote().astype(str)  # previous partitions are stored as strings
+    relatorio = validar_indicadores(hoje, ontem)
+    assert relatorio["violacoes"] == []
+    assert relatorio["bloquear"] is False
+    assert relatorio["delta_linhas"] == 0
+
+
+def test_mudanca_de_layout_anula_colunas():
+    """Half the columns turning null flags a layout change on the source."""
+    hoje = _lote()
+    for coluna in ["cotacao", "p_vp", "vp_cota", "div_yield"]:
+        hoje[coluna] = None
+    relatorio = validar_indicadores(hoje, _lote())
+    assert set(relatorio["colunas_anuladas"]) == {"cotacao", "p_vp", "vp_cota", "div_yield"}
+    assert relatorio["bloquear"]
+
+
+def test_primeira_execucao_nao_acusa_mudanca_de_layout():
+    """Without a previous partition there is no baseline, so sparse columns are not a layout change."""
+    hoje = _lote()
+    # Real estate fields are mostly null for paper funds
+    for coluna in ["vacancia_media", "patrimonio_liquido", "numero_cotas"]:
+        hoje.loc[hoje.index[: int(len(hoje) * 0.6)], coluna] = None
+    relatorio = validar_indicadores(hoje)
+    assert relatorio["colunas_anuladas"] == []
+    assert relatorio["bloquear"] is False
+    # The same batch against a fully populated previous day is flagged
+    assert validar_indicadores(hoje, _lote())["bloquear"]
+
+
+def test_valores_fora_dos_limites_e_nao_convertidos():
+    hoje = _lote(n=100)
+    hoje.loc[:9, "vacancia_media"] = 1.5
+    hoje["p_vp"] = hoje["p_vp"].astype(object)
+    hoje.loc[:9, "p_vp"] = "--"
+    relatorio = validar_indicadores(hoje)
+    assert relatorio["fora_dos_limites"] == {"vacancia_media": 10}
+    assert relatorio["nao_convertidos"] == {"p_vp": 10}
+    assert len(relatorio["violacoes"]) == 2
+
+
+def test_saltos_contra_particao_anterior():
+    ontem = _lote(n=100)
+    hoje = ontem.copy()
+    hoje.loc[:19, "cotacao"] = hoje.loc[:19, "cotacao"] * 3
+    relatorio = validar_indicadores(hoje, ontem)
+    assert relatorio["saltos"] == {"cotacao": 20}
+    assert any("cotacao" in v for v in relatorio["violacoes"])
+
+    # Rows are matched by ticker, not by position
+    embaralhado = ontem.sample(frac=1, random_state=0).astype(str)
+    assert validar_indicadores(hoje, embaralhado)["saltos"] == {"cotacao": 20}
+
+
+def test_queda_no_numero_de_linhas_e_tickers_invalidos():
+    ontem = _lote(n=100)
+    hoje = ontem.iloc[:50]
+    relatorio = validar_indicadores(hoje, ontem, tickers_invalidos=50)
+    assert relatorio["delta_linhas"] == -0.5
+    assert relatorio["tickers_invalidos"] == 50
+    assert len(relatorio["violacoes"]) == 2
+
+
+def _lote_completo(n, seed):
+    """Every FII field, with 20% nulls in the numeric ones, like a real scrape."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame([vars(FII(f"F{i:04d}11")) for i in range(n)])
+    for coluna in _colunas_numericas(df):
+        valores = rng.uniform(0, 1, n).astype(object)
+        valores[rng.random(n) < 0.2] = None
+        df[coluna] = valores
+    return df
+
+
+def test_cada_particao_convertida_uma_unica_vez(monkeypatch):
+    """Every partition is parsed in at most one vectorized to_numeric call, whatever its size."""
+    hoje = _lote_completo(5000, seed=1)
+    # Previous partitions are strings, with nulls stored as 'None'
+    ontem = _lote_completo(5000, seed=2).astype(object).fillna("None").astype(str)
+
+    chamadas = []
+    to_numeric = pd.to_numeric
+
+    def _contar(valores, *args, **kwargs):
+        chamadas.append(len(valores))
+        return to_numeric(valores, *args, **kwargs)
+
+    monkeypatch.setattr(pd, "to_numeric", _contar)
+    validar_indicadores(hoje, ontem)
+
+    # The typed batch converts without parsing, the previous one in a single call
+    colunas = len(_colunas_numericas(ontem))
+    assert chamadas == [len(ontem) * colunas]
+
+
+def test_relatorio_gravado_ao_lado_da_particao(s3):
+    """The report is written next to the day's partition, compared with the latest previous one."""
+    upload_df_to_s3(_lote(n=100).astype(str), BUCKET, f"{PREFIXO}ingest_date=2025-01-30/data_parquet")
+
+    relatorio = validar_e_registrar(_lote(n=60), BUCKET, "2025-01-31", tickers_invalidos=2)
+
+    chave = f"{PREFIXO}ingest_date=2025-01-31/quality_report.json"
+    gravado = json.loads(s3.get_object(Bucket=BUCKET, Key=chave)["Body"].read())
+    assert gravado == relatorio
+    assert gravado["particao_anterior"] == "ingest_date=2025-01-30"
+    assert gravado["delta_linhas"] == -0.4
+
+
+def test_dia_bloqueado_nao_zera_a_comparacao_do_dia_seguinte(s3):
+    """A blocked day leaves only its report; the next day must still compare with the last data."""
+    upload_df_to_s3(_lote(n=100).astype(str), BUCKET, f"{PREFIXO}ingest_date=2025-01-29/data_parquet")
+    quebrado = _lote(n=100)
+    for coluna in ["cotacao", "p_vp", "vp_cota", "div_yield"]:
+        quebrado[coluna] = None
+
+    # Day 1 is blocked, so only the report is written to its partition
+    assert validar_e_registrar(quebrado, BUCKET, "2025-01-30")["bloquear"]
+
+    # Day 2 reruns with the same break and is still blocked
+    relatorio = validar_e_registrar(quebrado, BUCKET, "2025-01-31")
+    assert relatorio["bloquear"]
+    assert relatorio["particao_anterior"] == "ingest_date=2025-01-29"